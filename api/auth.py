@@ -1,21 +1,35 @@
 import base64
+import functools
 import hashlib
 import hmac
 import os
-import re
 import secrets
+import threading
+import time
 import uuid
-from datetime import datetime, timedelta, timezone
+from collections import OrderedDict, namedtuple
+from datetime import datetime
 
 import requests
-from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
+from argon2.low_level import ARGON2_VERSION, Type, hash_secret, verify_secret
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from psycopg2.extras import RealDictCursor
 
+try:
+    from fastpbkdf2 import pbkdf2_hmac as _fastpbkdf2_hmac
+except ImportError:
+    _fastpbkdf2_hmac = None
+
+from api.prepared import execute_prepared
+
 
-EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 PBKDF2_ITERATIONS = 120_000
 SESSION_DAYS = 30
+SESSION_CACHE_TTL_SEC = float(os.getenv("SESSION_CACHE_TTL_SEC", "5"))
+SESSION_CACHE_MAX = int(os.getenv("SESSION_CACHE_MAX", "100000"))
+SESSION_TOUCH_FLUSH_SEC = float(os.getenv("SESSION_TOUCH_FLUSH_SEC", "2"))
 AUTH_PEPPER = os.getenv("AUTH_PEPPER", "")
 AUTH_CAPTCHA_BYPASS = os.getenv("AUTH_CAPTCHA_BYPASS", "")
 CAPTCHA_PROVIDER = os.getenv("CAPTCHA_PROVIDER", "").lower()
@@ -25,22 +39,33 @@ RECAPTCHA_MIN_SCORE = float(os.getenv("RECAPTCHA_MIN_SCORE", "0.5"))
 TURNSTILE_VERIFY_URL = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
 RECAPTCHA_VERIFY_URL = "https://www.google.com/recaptcha/api/siteverify"
 ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
-ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "102400"))
-ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "8"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "204800"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
 ARGON2_HASH_LEN = int(os.getenv("ARGON2_HASH_LEN", "32"))
 ARGON2_SALT_LEN = int(os.getenv("ARGON2_SALT_LEN", "16"))
+ARGON2_MAX_CONCURRENCY = int(
+    os.getenv("ARGON2_MAX_CONCURRENCY", str(max(2, (os.cpu_count() or 2) // 2)))
+)
+
+SessionRow = namedtuple("SessionRow", "session_token user_id expires_at")
 
 LOGIN_FAIL_DELAY_THRESHOLD = int(os.getenv("AUTH_FAIL_DELAY_THRESHOLD", "5"))
 LOGIN_FAIL_DELAY_SECONDS = int(os.getenv("AUTH_FAIL_DELAY_SECONDS", "30"))
 LOGIN_CAPTCHA_THRESHOLD = int(os.getenv("AUTH_CAPTCHA_THRESHOLD", "10"))
 
-PASSWORD_HASHER = PasswordHasher(
-    time_cost=ARGON2_TIME_COST,
-    memory_cost=ARGON2_MEMORY_COST,
-    parallelism=ARGON2_PARALLELISM,
-    hash_len=ARGON2_HASH_LEN,
-    salt_len=ARGON2_SALT_LEN,
+ARGON2_PARAMS_PREFIX = (
+    f"$argon2id$v={ARGON2_VERSION}"
+    f"$m={ARGON2_MEMORY_COST},t={ARGON2_TIME_COST},p={ARGON2_PARALLELISM}$"
 )
+_ARGON2_SALT_B64_LEN = (ARGON2_SALT_LEN * 4 + 2) // 3
+_ARGON2_HASH_B64_LEN = (ARGON2_HASH_LEN * 4 + 2) // 3
+
+_ARGON2_SEMAPHORE = threading.BoundedSemaphore(max(1, ARGON2_MAX_CONCURRENCY))
+_SESSION_CACHE: OrderedDict = OrderedDict()
+_SESSION_CACHE_LOCK = threading.Lock()
+_TOUCH_BUFFER: set = set()
+_TOUCH_LOCK = threading.Lock()
+_TOUCH_LAST_FLUSH = time.monotonic()
 
 
 def normalize_email(email: str) -> str:
@@ -48,54 +73,125 @@ def normalize_email(email: str) -> str:
 
 
 def validate_email(email: str) -> bool:
-    if not email:
+    # Same rule as ^[^@\s]+@[^@\s]+\.[^@\s]+$, checked with plain str scans.
+    if not email or email.count("@") != 1:
+        return False
+    local, _, domain = email.partition("@")
+    if not local or "." not in domain[1:-1]:
         return False
-    return bool(EMAIL_PATTERN.match(email))
+    return not any(map(str.isspace, email))
 
 
-def _pepper_password(password: str) -> str:
-    if not AUTH_PEPPER:
+_PEPPER_BYTES = AUTH_PEPPER.encode("utf-8")
+
+if _PEPPER_BYTES:
+
+    def _pepper_password(password: bytes) -> bytes:
+        return password + _PEPPER_BYTES
+
+else:
+
+    def _pepper_password(password: bytes) -> bytes:
         return password
-    return f"{password}{AUTH_PEPPER}"
 
 
 def hash_password(password: str) -> str:
-    return PASSWORD_HASHER.hash(_pepper_password(password))
+    with _ARGON2_SEMAPHORE:
+        encoded = hash_secret(
+            _pepper_password(password.encode("utf-8")),
+            os.urandom(ARGON2_SALT_LEN),
+            time_cost=ARGON2_TIME_COST,
+            memory_cost=ARGON2_MEMORY_COST,
+            parallelism=ARGON2_PARALLELISM,
+            hash_len=ARGON2_HASH_LEN,
+            type=Type.ID,
+        )
+    return encoded.decode("ascii")
+
 
+def _pbkdf2_sha256(password: bytes, salt: bytes, iterations: int, length: int) -> bytes:
+    if _fastpbkdf2_hmac is not None:
+        return _fastpbkdf2_hmac("sha256", password, salt, iterations, length)
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=length,
+        salt=salt,
+        iterations=iterations,
+    )
+    return kdf.derive(password)
 
-def _verify_pbkdf2(password: str, stored: str) -> bool:
+
+def _parse_pbkdf2(stored: str) -> tuple[int, bytes, bytes] | None:
     try:
         algo, iter_text, salt_b64, digest_b64 = stored.split("$", 3)
         if algo != "pbkdf2_sha256":
-            return False
-        iterations = int(iter_text)
-        salt = base64.b64decode(salt_b64.encode("ascii"))
-        expected = base64.b64decode(digest_b64.encode("ascii"))
-        candidate = hashlib.pbkdf2_hmac(
-            "sha256", password.encode("utf-8"), salt, iterations
+            return None
+        return (
+            int(iter_text),
+            base64.b64decode(salt_b64.encode("ascii")),
+            base64.b64decode(digest_b64.encode("ascii")),
         )
+    except Exception:
+        return None
+
+
+def _verify_pbkdf2(password: bytes, parts: tuple[int, bytes, bytes] | None) -> bool:
+    if parts is None:
+        return False
+    iterations, salt, expected = parts
+    try:
+        candidate = _pbkdf2_sha256(password, salt, iterations, len(expected))
         return hmac.compare_digest(candidate, expected)
     except Exception:
         return False
 
 
-def verify_password(password: str, stored: str) -> bool:
+def verify_password(
+    password: str,
+    stored: str,
+    pbkdf2_parts: tuple[int, bytes, bytes] | None = None,
+) -> bool:
+    password_bytes = password.encode("utf-8")
     if stored.startswith("pbkdf2_sha256$"):
-        return _verify_pbkdf2(password, stored)
+        return _verify_pbkdf2(password_bytes, pbkdf2_parts or _parse_pbkdf2(stored))
     try:
-        return PASSWORD_HASHER.verify(stored, _pepper_password(password))
+        with _ARGON2_SEMAPHORE:
+            return verify_secret(
+                stored.encode("ascii"),
+                _pepper_password(password_bytes),
+                Type.ID,
+            )
     except VerifyMismatchError:
         return False
     except Exception:
         return False
 
 
+@functools.lru_cache(maxsize=1)
+def _dummy_password_hash() -> str:
+    return hash_password(secrets.token_urlsafe(16))
+
+
+def warm_dummy_password_hash() -> None:
+    _dummy_password_hash()
+
+
+def verify_password_or_dummy(
+    password: str,
+    stored: str | None,
+    pbkdf2_parts: tuple[int, bytes, bytes] | None = None,
+) -> bool:
+    if stored:
+        return verify_password(password, stored, pbkdf2_parts)
+    verify_password(password, _dummy_password_hash())
+    return False
+
+
 def needs_password_upgrade(stored: str) -> bool:
-    if stored.startswith("pbkdf2_sha256$"):
+    if not stored.startswith(ARGON2_PARAMS_PREFIX):
         return True
-    if stored.startswith("$argon2id$"):
-        return PASSWORD_HASHER.check_needs_rehash(stored)
-    return True
+    salt_b64, _, hash_b64 = stored[len(ARGON2_PARAMS_PREFIX) :].partition("$")
+    return len(salt_b64) != _ARGON2_SALT_B64_LEN or len(hash_b64) != _ARGON2_HASH_B64_LEN
 
 
 def update_password_hash(conn, user_id: str, new_hash: str) -> None:
@@ -162,7 +258,9 @@ def verify_captcha_token(token: str | None, ip_address: str | None = None) -> bo
 
 def get_login_attempt(conn, scope: str, scope_key: str) -> dict | None:
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(
+        execute_prepared(
+            cur,
+            "auth_get_login_attempt",
             """
             SELECT scope, scope_key, fail_count, blocked_until, last_failed_at
             FROM auth_login_attempt
@@ -195,51 +293,40 @@ def requires_captcha(attempt: dict | None) -> bool:
     return int(attempt.get("fail_count") or 0) >= LOGIN_CAPTCHA_THRESHOLD
 
 
-def record_login_failure(conn, scope: str, scope_key: str, now: datetime) -> None:
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+def record_login_failure(conn, scope: str, scope_key: str) -> None:
+    with conn.cursor() as cur:
         cur.execute(
             """
-            SELECT fail_count
-            FROM auth_login_attempt
-            WHERE scope = %s AND scope_key = %s
-            FOR UPDATE
+            INSERT INTO auth_login_attempt AS a
+              (scope, scope_key, fail_count, blocked_until, last_failed_at)
+            VALUES (
+              %(scope)s, %(scope_key)s, 1,
+              CASE WHEN 1 >= %(threshold)s THEN now() + make_interval(secs => %(delay)s) END,
+              now()
+            )
+            ON CONFLICT (scope, scope_key) DO UPDATE
+            SET fail_count = COALESCE(a.fail_count, 0) + 1,
+                blocked_until = CASE
+                  WHEN COALESCE(a.fail_count, 0) + 1 >= %(threshold)s
+                  THEN now() + make_interval(secs => %(delay)s)
+                END,
+                last_failed_at = now(),
+                updated_at = now()
             """,
-            (scope, scope_key),
+            {
+                "scope": scope,
+                "scope_key": scope_key,
+                "threshold": LOGIN_FAIL_DELAY_THRESHOLD,
+                "delay": LOGIN_FAIL_DELAY_SECONDS,
+            },
         )
-        row = cur.fetchone()
-        if row:
-            fail_count = int(row["fail_count"] or 0) + 1
-            blocked_until = None
-            if fail_count >= LOGIN_FAIL_DELAY_THRESHOLD:
-                blocked_until = now + timedelta(seconds=LOGIN_FAIL_DELAY_SECONDS)
-            cur.execute(
-                """
-                UPDATE auth_login_attempt
-                SET fail_count = %s,
-                    blocked_until = %s,
-                    last_failed_at = %s,
-                    updated_at = now()
-                WHERE scope = %s AND scope_key = %s
-                """,
-                (fail_count, blocked_until, now, scope, scope_key),
-            )
-        else:
-            blocked_until = None
-            if 1 >= LOGIN_FAIL_DELAY_THRESHOLD:
-                blocked_until = now + timedelta(seconds=LOGIN_FAIL_DELAY_SECONDS)
-            cur.execute(
-                """
-                INSERT INTO auth_login_attempt
-                  (scope, scope_key, fail_count, blocked_until, last_failed_at)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                (scope, scope_key, 1, blocked_until, now),
-            )
 
 
 def clear_login_attempt(conn, scope: str, scope_key: str) -> None:
     with conn.cursor() as cur:
-        cur.execute(
+        execute_prepared(
+            cur,
+            "auth_clear_login_attempt",
             """
             DELETE FROM auth_login_attempt
             WHERE scope = %s AND scope_key = %s
@@ -279,7 +366,9 @@ def create_user_oauth(conn, email: str) -> dict:
 
 def get_user_by_email(conn, email: str) -> dict | None:
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(
+        execute_prepared(
+            cur,
+            "auth_get_user_by_email",
             """
             SELECT user_id, email, password_hash, created_at, last_login
             FROM app_user
@@ -287,12 +376,17 @@ def get_user_by_email(conn, email: str) -> dict | None:
             """,
             (email,),
         )
-        return cur.fetchone()
+        user = cur.fetchone()
+    if user and user["password_hash"].startswith("pbkdf2_sha256$"):
+        user["_pbkdf2_parts"] = _parse_pbkdf2(user["password_hash"])
+    return user
 
 
 def get_user_by_id(conn, user_id: str) -> dict | None:
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(
+        execute_prepared(
+            cur,
+            "auth_get_user_by_id",
             """
             SELECT user_id, email, created_at, last_login
             FROM app_user
@@ -303,76 +397,153 @@ def get_user_by_id(conn, user_id: str) -> dict | None:
         return cur.fetchone()
 
 
+_b64encode = base64.urlsafe_b64encode
+_urandom = os.urandom
+
+
+def _new_session_token() -> str:
+    return _b64encode(_urandom(32)).rstrip(b"=").decode("ascii")
+
+
+def _session_token_hash(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
 def create_session(conn, user_id: str, device_id: str | None = None) -> dict:
-    token = secrets.token_urlsafe(32)
-    now = datetime.now(timezone.utc)
-    expires_at = now + timedelta(days=SESSION_DAYS)
+    token = _new_session_token()
     with conn.cursor() as cur:
         cur.execute(
             """
-            INSERT INTO user_session
-              (session_token, user_id, device_id, created_at, expires_at, last_seen)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """,
-            (token, user_id, device_id, now, expires_at, now),
-        )
-        cur.execute(
-            """
-            UPDATE app_user
-            SET last_login = %s
-            WHERE user_id = %s
+            WITH new_session AS (
+              INSERT INTO user_session
+                (session_token_sha256, user_id, device_id, created_at, expires_at, last_seen)
+              VALUES (%s, %s, %s, now(), now() + make_interval(days => %s), now())
+              RETURNING user_id, expires_at
+            ), login AS (
+              INSERT INTO login_event (user_id)
+              SELECT user_id
+              FROM new_session
+            )
+            SELECT expires_at
+            FROM new_session
             """,
-            (now, user_id),
+            (_session_token_hash(token), user_id, device_id, SESSION_DAYS),
         )
+        expires_at = cur.fetchone()[0]
     return {"session_token": token, "expires_at": expires_at}
 
 
 def update_last_login(conn, user_id: str) -> None:
-    now = datetime.now(timezone.utc)
     with conn.cursor() as cur:
         cur.execute(
             """
-            UPDATE app_user
-            SET last_login = %s
-            WHERE user_id = %s
+            INSERT INTO login_event (user_id)
+            VALUES (%s)
             """,
-            (now, user_id),
+            (user_id,),
         )
 
 
-def get_session(conn, token: str) -> dict | None:
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(
+def _session_cache_get(key: bytes) -> SessionRow | None:
+    with _SESSION_CACHE_LOCK:
+        entry = _SESSION_CACHE.get(key)
+        if entry is None:
+            return None
+        expires_mono, session = entry
+        if time.monotonic() >= expires_mono:
+            _SESSION_CACHE.pop(key, None)
+            return None
+        _SESSION_CACHE.move_to_end(key)
+        return session
+
+
+def _session_cache_put(key: bytes, session: SessionRow) -> None:
+    with _SESSION_CACHE_LOCK:
+        _SESSION_CACHE[key] = (time.monotonic() + SESSION_CACHE_TTL_SEC, session)
+        _SESSION_CACHE.move_to_end(key)
+        while len(_SESSION_CACHE) > SESSION_CACHE_MAX:
+            _SESSION_CACHE.popitem(last=False)
+
+
+def _session_cache_pop(key: bytes) -> None:
+    with _SESSION_CACHE_LOCK:
+        _SESSION_CACHE.pop(key, None)
+
+
+def get_session(conn, token: str) -> SessionRow | None:
+    key = _session_token_hash(token)
+    if SESSION_CACHE_TTL_SEC > 0:
+        cached = _session_cache_get(key)
+        if cached is not None:
+            return cached
+    with conn.cursor() as cur:
+        execute_prepared(
+            cur,
+            "auth_get_session",
             """
-            SELECT session_token, user_id, expires_at
+            SELECT user_id, expires_at
             FROM user_session
-            WHERE session_token = %s
+            WHERE session_token_sha256 = %s
             """,
-            (token,),
+            (key,),
         )
-        return cur.fetchone()
+        row = cur.fetchone()
+    if row is None:
+        return None
+    session = SessionRow(token, *row)
+    if SESSION_CACHE_TTL_SEC > 0:
+        _session_cache_put(key, session)
+    return session
+
+
+def _flush_touches(conn, touched: set) -> None:
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE user_session
+                SET last_seen = now()
+                WHERE session_token_sha256 = ANY(%s)
+                """,
+                (list(touched),),
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        with _TOUCH_LOCK:
+            _TOUCH_BUFFER.update(touched)
+        raise
+
+
+def flush_session_touches(conn) -> None:
+    global _TOUCH_BUFFER, _TOUCH_LAST_FLUSH
+    with _TOUCH_LOCK:
+        touched, _TOUCH_BUFFER = _TOUCH_BUFFER, set()
+        _TOUCH_LAST_FLUSH = time.monotonic()
+    if touched:
+        _flush_touches(conn, touched)
 
 
 def touch_session(conn, token: str) -> None:
-    now = datetime.now(timezone.utc)
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            UPDATE user_session
-            SET last_seen = %s
-            WHERE session_token = %s
-            """,
-            (now, token),
-        )
+    key = _session_token_hash(token)
+    with _TOUCH_LOCK:
+        _TOUCH_BUFFER.add(key)
+        if time.monotonic() - _TOUCH_LAST_FLUSH < SESSION_TOUCH_FLUSH_SEC:
+            return
+    flush_session_touches(conn)
 
 
 def revoke_session(conn, token: str) -> bool:
+    key = _session_token_hash(token)
+    _session_cache_pop(key)
     with conn.cursor() as cur:
-        cur.execute(
+        execute_prepared(
+            cur,
+            "auth_revoke_session",
             """
             DELETE FROM user_session
-            WHERE session_token = %s
+            WHERE session_token_sha256 = %s
             """,
-            (token,),
+            (key,),
         )
         return cur.rowcount > 0
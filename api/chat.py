@@ -1,38 +1,75 @@
+import atexit
 import json
 import os
+import queue
 import re
 import uuid
 import hashlib
+import heapq
+import sqlite3
+import threading
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Callable, Dict, List, Optional
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import Counter, OrderedDict
 
+import ahocorasick
+import numpy as np
+import orjson
 import requests
-from psycopg2.extras import RealDictCursor
+from requests.adapters import HTTPAdapter
+from psycopg2.extras import execute_values
 
 from etl.utils import normalize_text
 
-from api.search import TRGM_SIMILARITY_THRESHOLD, search_verses, search_verses_vector
+from api.prepared import execute_prepared
+from api.search import TRGM_SIMILARITY_THRESHOLD, search_verses_first_hit, search_verses_vector
+from api.semantic_cache import citation_cache
 
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1")
 OLLAMA_TIMEOUT_SEC = float(os.getenv("OLLAMA_TIMEOUT_SEC", "60"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
 OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
 EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "768"))
 EMBEDDING_TIMEOUT_SEC = float(os.getenv("EMBEDDING_TIMEOUT_SEC", "5"))
+EMBED_CACHE_MAX = int(os.getenv("EMBED_CACHE_MAX", "1024"))
+EMBED_CACHE_TTL_SEC = int(os.getenv("EMBED_CACHE_TTL_SEC", "3600"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "8"))
 EVENT_LOG_PATH = os.getenv("EVENT_LOG_PATH", "logs/events.log")
+EVENT_LOG_BATCH_MAX = int(os.getenv("EVENT_LOG_BATCH_MAX", "500"))
+EVENT_LOG_FLUSH_SEC = float(os.getenv("EVENT_LOG_FLUSH_SEC", "0.1"))
 LLM_SLOW_MS = int(os.getenv("LLM_SLOW_MS", "2000"))
 RETRIEVAL_SLOW_MS = int(os.getenv("RETRIEVAL_SLOW_MS", "500"))
+FTS_CONFIDENT_RANK = float(os.getenv("FTS_CONFIDENT_RANK", "0.5"))
+FTS_CONFIDENT_HITS = int(os.getenv("FTS_CONFIDENT_HITS", "2"))
 LOG_ID_SALT = os.getenv("LOG_ID_SALT", "")
 ENABLE_MORPH_ANALYZER = os.getenv("ENABLE_MORPH_ANALYZER", "1") == "1"
 MAX_QUERY_TERMS = int(os.getenv("MAX_QUERY_TERMS", "20"))
+SCORE_TERMS_DIRECT_MAX = 8
+VERSE_NORM_CACHE_MAX = int(os.getenv("VERSE_NORM_CACHE_MAX", "50000"))
+CONVERSATION_CACHE_MAX = int(os.getenv("CONVERSATION_CACHE_MAX", "10000"))
+SYNONYM_CACHE_TTL_SEC = int(os.getenv("SYNONYM_CACHE_TTL_SEC", "900"))
+SYNONYM_CACHE_MAX = int(os.getenv("SYNONYM_CACHE_MAX", "4096"))
 VECTOR_ENABLED = os.getenv("VECTOR_ENABLED", "1") == "1"
 VECTOR_TOPK = int(os.getenv("VECTOR_TOPK", "50"))
 VECTOR_WINDOW_SIZE = int(os.getenv("VECTOR_WINDOW_SIZE", "5"))
 RERANK_MODE = "ko-bert"
 RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
 RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "3"))
+RERANK_SKIP_KEYWORD_HITS = int(os.getenv("RERANK_SKIP_KEYWORD_HITS", "3"))
+RERANK_SKIP_TRGM = float(os.getenv("RERANK_SKIP_TRGM", "0.9"))
+RERANK_CACHE_MAX = int(os.getenv("RERANK_CACHE_MAX", "512"))
+LLM_CACHE_MAX = int(os.getenv("LLM_CACHE_MAX", "1024"))
+LLM_CACHE_TTL_SEC = int(os.getenv("LLM_CACHE_TTL_SEC", "300"))
 KOBERT_MODEL_ID = os.getenv("KOBERT_MODEL_ID", "skt/kobert-base-v1")
+KOBERT_CACHE_PATH = os.getenv("KOBERT_CACHE_PATH", ".cache/kobert_cache.sqlite")
+KOBERT_CACHE_TTL_SEC = int(os.getenv("KOBERT_CACHE_TTL_SEC", "0"))
+KOBERT_BATCH_SIZE = max(1, int(os.getenv("KOBERT_BATCH_SIZE", "16")))
+KOBERT_QUANTIZE = os.getenv("KOBERT_QUANTIZE", "1") == "1"
 MIN_CITATION_RANK = float(os.getenv("MIN_CITATION_RANK", "0.05"))
 MIN_CITATION_TRGM = float(os.getenv("MIN_CITATION_TRGM", str(TRGM_SIMILARITY_THRESHOLD)))
 MIN_CITATION_KEYWORD_HITS = int(os.getenv("MIN_CITATION_KEYWORD_HITS", "1"))
@@ -43,11 +80,17 @@ OPENAI_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC", "30"))
 OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.4"))
 OPENAI_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", "800"))
 OPENAI_CITATION_ENABLED = os.getenv("OPENAI_CITATION_ENABLED", "0") == "1"
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
 
 SUMMARY_MAX_CHARS = 800
 SUMMARY_TRIGGER_TURNS = 30
 RECENT_TURNS = 8
 
+# Shared keep-alive session so Ollama/OpenAI calls reuse TCP connections.
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0))
+HTTP_SESSION.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0))
+
 
 def select_version_id(locale: Optional[str]) -> str:
     if locale and locale.lower().startswith("ko"):
@@ -59,6 +102,8 @@ def select_version_id(locale: Optional[str]) -> str:
 
 LANG_KO_RE = re.compile(r"[가-힣]")
 LANG_OTHER_RE = re.compile(r"[A-Za-z\u3040-\u30ff\u3400-\u9fff]")
+# Whitespace-delimited tokens of 2+ chars that are not all digits.
+TOKEN_RE = re.compile(r"(?<!\S)(?!\d+(?!\S))\S{2,}")
 
 
 def select_citation_version_id(locale: Optional[str], text: str) -> str:
@@ -68,12 +113,12 @@ def select_citation_version_id(locale: Optional[str], text: str) -> str:
         return "eng-web"
     return select_version_id(locale)
 
-RISK_PATTERNS = [
-    r"자해",
-    r"자살",
-    r"죽고 싶",
-    r"죽고싶",
-    r"끝내고 싶",
+RISK_KEYWORDS = [
+    "자해",
+    "자살",
+    "죽고 싶",
+    "죽고싶",
+    "끝내고 싶",
 ]
 
 CRISIS_RESPONSE = (
@@ -154,11 +199,73 @@ PII_PATTERNS = [
     (re.compile(r"\b\d{6}-\d{7}\b"), "[RRN]"),
     (re.compile(r"\b\d{3}-\d{2}-\d{5}\b"), "[BANK]"),
 ]
+PII_RE = re.compile(
+    "|".join(f"(?P<pii{idx}>{pattern.pattern})" for idx, (pattern, _repl) in enumerate(PII_PATTERNS))
+)
+PII_REPLACEMENTS = {f"pii{idx}": repl for idx, (_pattern, repl) in enumerate(PII_PATTERNS)}
+
+CITATION_LINE_RE = re.compile(r"^\([^)]*\d+\s*:\s*\d+(?:\s*-\s*\d+)?\)[\s\S]*$")
+
+GATING_KEYWORDS = {
+    "risk": RISK_KEYWORDS,
+    "closing": CLOSING_KEYWORDS,
+    "info": INFO_QUESTION_KEYWORDS,
+    "small_talk": SMALL_TALK_KEYWORDS,
+    "verse_request": VERSE_REQUEST_KEYWORDS,
+    **{f"topic:{topic}": keywords for topic, keywords in TOPIC_LEXICON.items()},
+}
+
+
+def _build_gating_automaton():
+    labels_by_keyword: Dict[str, set] = {}
+    for label, keywords in GATING_KEYWORDS.items():
+        for keyword in keywords:
+            labels_by_keyword.setdefault(keyword, set()).add(label)
+    automaton = ahocorasick.Automaton()
+    for keyword, labels in labels_by_keyword.items():
+        automaton.add_word(keyword, frozenset(labels))
+    automaton.make_automaton()
+    return automaton
+
+
+GATING_AUTOMATON = _build_gating_automaton()
+SYNONYM_CACHE: "OrderedDict[str, tuple]" = OrderedDict()
+SYNONYM_CACHE_LOCK = threading.Lock()
+EMBED_CACHE: "OrderedDict[str, tuple]" = OrderedDict()
+EMBED_CACHE_LOCK = threading.Lock()
+EMBED_CACHE_STATS = {"hits": 0, "misses": 0}
+EMBED_INFLIGHT: Dict[str, Future] = {}
+RERANK_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
+RERANK_CACHE_LOCK = threading.Lock()
+RERANK_CACHE_STATS = {"hits": 0, "misses": 0}
+LLM_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
+LLM_CACHE_LOCK = threading.Lock()
+LLM_CACHE_STATS = {"hits": 0, "misses": 0}
+# Context embeddings are requested in the background while keyword extraction
+# and FTS run on the request thread.
+EMBED_EXECUTOR = ThreadPoolExecutor(max_workers=EMBED_WORKERS, thread_name_prefix="embed")
 
 
 class ConversationStore:
     def __init__(self):
-        self._conversations: Dict[str, dict] = {}
+        self._conversations: "OrderedDict[str, dict]" = OrderedDict()
+        self._conversations_lock = threading.Lock()
+        self._pending: Dict[str, List[tuple]] = {}
+        self._pending_lock = threading.Lock()
+
+    def _cached(self, conversation_id: str) -> Optional[dict]:
+        with self._conversations_lock:
+            record = self._conversations.get(conversation_id)
+            if record is not None:
+                self._conversations.move_to_end(conversation_id)
+            return record
+
+    def _cache(self, conversation_id: str, record: dict) -> None:
+        with self._conversations_lock:
+            self._conversations[conversation_id] = record
+            self._conversations.move_to_end(conversation_id)
+            while len(self._conversations) > CONVERSATION_CACHE_MAX:
+                self._conversations.popitem(last=False)
 
     def _mem_create(
         self,
@@ -191,7 +298,7 @@ class ConversationStore:
             "messages": [],
             "summary": "",
         }
-        self._conversations[conversation_id] = record
+        self._cache(conversation_id, record)
         return record
 
     def create(
@@ -223,7 +330,9 @@ class ConversationStore:
         now = datetime.now(timezone.utc).isoformat()
         try:
             with conn.cursor() as cur:
-                cur.execute(
+                execute_prepared(
+                    cur,
+                    "chat_conversation_insert",
                     """
                     INSERT INTO chat_conversation
                     (conversation_id, device_id, locale, version_id, store_messages, summary, created_at, updated_at)
@@ -260,14 +369,16 @@ class ConversationStore:
         )
 
     def get(self, conversation_id: str, conn=None) -> Optional[dict]:
-        record = self._conversations.get(conversation_id)
+        record = self._cached(conversation_id)
         if record is not None:
             return record
         if conn is None:
             return None
         try:
             with conn.cursor() as cur:
-                cur.execute(
+                execute_prepared(
+                    cur,
+                    "chat_conversation_get",
                     """
                     SELECT conversation_id, device_id, locale, version_id, store_messages, summary, created_at
                     FROM chat_conversation
@@ -280,7 +391,9 @@ class ConversationStore:
                     return None
                 messages = []
                 if conv[4]:
-                    cur.execute(
+                    execute_prepared(
+                        cur,
+                        "chat_messages_get",
                         """
                         SELECT role, content, created_at
                         FROM chat_message
@@ -294,7 +407,7 @@ class ConversationStore:
                         for row in cur.fetchall()
                     ]
         except Exception:
-            return self._conversations.get(conversation_id)
+            return self._cached(conversation_id)
         record = {
             "conversation_id": conv[0],
             "device_id": conv[1],
@@ -310,16 +423,21 @@ class ConversationStore:
             "turn_count": None,
             "user_id": None,
         }
-        self._conversations[conversation_id] = record
+        self._cache(conversation_id, record)
         return record
 
     def delete(self, conversation_id: str, conn=None) -> bool:
-        deleted = self._conversations.pop(conversation_id, None) is not None
+        with self._conversations_lock:
+            deleted = self._conversations.pop(conversation_id, None) is not None
+        with self._pending_lock:
+            self._pending.pop(conversation_id, None)
         if conn is None:
             return deleted
         try:
             with conn.cursor() as cur:
-                cur.execute(
+                execute_prepared(
+                    cur,
+                    "chat_conversation_delete",
                     "DELETE FROM chat_conversation WHERE conversation_id = %s",
                     (conversation_id,),
                 )
@@ -330,56 +448,99 @@ class ConversationStore:
             conn.rollback()
             return deleted
 
-    def add_message(self, conversation_id: str, role: str, content: str, conn=None) -> None:
-        record = self._conversations.get(conversation_id)
-        if record is None and conn is not None:
-            record = self.get(conversation_id, conn=conn)
+    def add_message(
+        self, conversation_id: str, role: str, content: str, conn=None, defer: bool = False
+    ) -> None:
+        record = self._cached(conversation_id)
+        created_at = datetime.now(timezone.utc).isoformat()
         if record is None:
+            if conn is not None:
+                self._insert_uncached_message(conversation_id, role, content, created_at, conn)
             return
 
-        record["messages"].append(
-            {"role": role, "content": content, "created_at": datetime.now(timezone.utc).isoformat()}
-        )
+        record["messages"].append({"role": role, "content": content, "created_at": created_at})
         if not record.get("store_messages", False) or conn is None:
             return
-
+        with self._pending_lock:
+            self._pending.setdefault(conversation_id, []).append(
+                (conversation_id, role, content, created_at)
+            )
+        if not defer:
+            self.flush_messages(conversation_id, conn)
+
+    def _insert_uncached_message(
+        self, conversation_id: str, role: str, content: str, created_at: str, conn
+    ) -> None:
+        # The conversation row decides whether the message is stored, so an
+        # uncached conversation doesn't have to be loaded just to append to it.
         try:
             with conn.cursor() as cur:
-                cur.execute(
+                execute_prepared(
+                    cur,
+                    "chat_message_insert_uncached",
                     """
-                    INSERT INTO chat_message (conversation_id, role, content, created_at)
-                    VALUES (%s, %s, %s, now())
+                    WITH ins AS (
+                      INSERT INTO chat_message (conversation_id, role, content, created_at)
+                      SELECT conversation_id, %s, %s, %s::timestamptz
+                      FROM chat_conversation
+                      WHERE conversation_id = %s AND store_messages
+                      RETURNING conversation_id
+                    )
+                    UPDATE chat_conversation c
+                    SET updated_at = now()
+                    FROM ins
+                    WHERE c.conversation_id = ins.conversation_id
                     """,
-                    (conversation_id, role, content),
+                    (role, content, created_at, conversation_id),
                 )
-                cur.execute(
+            conn.commit()
+        except Exception:
+            conn.rollback()
+
+    def flush_messages(self, conversation_id: str, conn) -> None:
+        with self._pending_lock:
+            rows = self._pending.pop(conversation_id, None)
+        if not rows or conn is None:
+            return
+        try:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
                     """
-                    UPDATE chat_conversation
+                    WITH ins AS (
+                      INSERT INTO chat_message (conversation_id, role, content, created_at)
+                      VALUES %s
+                      RETURNING conversation_id
+                    )
+                    UPDATE chat_conversation c
                     SET updated_at = now()
-                    WHERE conversation_id = %s
+                    FROM (SELECT DISTINCT conversation_id FROM ins) i
+                    WHERE c.conversation_id = i.conversation_id
                     """,
-                    (conversation_id,),
+                    rows,
+                    template="(%s, %s, %s, %s::timestamptz)",
                 )
             conn.commit()
         except Exception:
             conn.rollback()
 
     def set_summary(self, conversation_id: str, summary: str, conn=None) -> None:
-        record = self._conversations.get(conversation_id)
-        if record is None and conn is not None:
-            record = self.get(conversation_id, conn=conn)
-        if record is None:
-            return
-        record["summary"] = summary
-        if not record.get("store_messages", False) or conn is None:
+        record = self._cached(conversation_id)
+        if record is not None:
+            record["summary"] = summary
+            if not record.get("store_messages", False):
+                return
+        if conn is None:
             return
         try:
             with conn.cursor() as cur:
-                cur.execute(
+                execute_prepared(
+                    cur,
+                    "chat_summary_update",
                     """
                     UPDATE chat_conversation
                     SET summary = %s, updated_at = now()
-                    WHERE conversation_id = %s
+                    WHERE conversation_id = %s AND store_messages
                     """,
                     (summary, conversation_id),
                 )
@@ -388,33 +549,29 @@ class ConversationStore:
             conn.rollback()
 
 
+@lru_cache(maxsize=8192)
 def _hash_id(value: str) -> str:
     raw = f"{LOG_ID_SALT}{value}".encode("utf-8")
-    return hashlib.sha256(raw).hexdigest()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
 
 
 def _mask_pii(text: str) -> str:
-    masked = text
-    for pattern, repl in PII_PATTERNS:
-        masked = pattern.sub(repl, masked)
-    return masked
+    return PII_RE.sub(lambda match: PII_REPLACEMENTS[match.lastgroup], text)
 
 
 def _risk_flags(text: str) -> List[str]:
-    flags = []
-    for pat in RISK_PATTERNS:
-        if re.search(pat, text):
-            flags.append("self_harm")
-            break
-    return flags
+    return ["self_harm"] if "risk" in _keyword_labels(text) else []
 
 
 KIWI = None
 KIWI_ERROR = False
-KIWI_POS_TAGS = {"NNG", "NNP", "NNB", "VV", "VA", "VX"}
+KIWI_POS_TAGS = frozenset({"NNG", "NNP", "NNB", "VV", "VA", "VX"})
 KOBERT_TOKENIZER = None
 KOBERT_MODEL = None
 KOBERT_ERROR = False
+KOBERT_VARIANT = "fp32"
+KOBERT_CACHE = None
+KOBERT_CACHE_LOCK = threading.Lock()
 
 
 def _get_kiwi():
@@ -433,7 +590,7 @@ def _get_kiwi():
 
 
 def _get_kobert():
-    global KOBERT_TOKENIZER, KOBERT_MODEL, KOBERT_ERROR
+    global KOBERT_TOKENIZER, KOBERT_MODEL, KOBERT_ERROR, KOBERT_VARIANT
     if KOBERT_ERROR:
         return None, None
     if KOBERT_MODEL is None or KOBERT_TOKENIZER is None:
@@ -442,92 +599,242 @@ def _get_kobert():
             from transformers import AutoModel, AutoTokenizer
 
             KOBERT_TOKENIZER = AutoTokenizer.from_pretrained(KOBERT_MODEL_ID)
-            KOBERT_MODEL = AutoModel.from_pretrained(KOBERT_MODEL_ID)
-            KOBERT_MODEL.eval()
-            KOBERT_MODEL.to(torch.device("cpu"))
+            model = AutoModel.from_pretrained(KOBERT_MODEL_ID)
+            model.eval()
+            model.to(torch.device("cpu"))
+            if KOBERT_QUANTIZE:
+                try:
+                    model = torch.ao.quantization.quantize_dynamic(
+                        model, {torch.nn.Linear}, dtype=torch.qint8
+                    )
+                    KOBERT_VARIANT = "int8"
+                except Exception:
+                    pass
+            KOBERT_MODEL = model
         except Exception:
             KOBERT_ERROR = True
             return None, None
     return KOBERT_TOKENIZER, KOBERT_MODEL
 
 
-def _embed_text(text: str) -> Optional[List[float]]:
-    if not text:
-        return None
-    payload = {"model": OLLAMA_EMBED_MODEL, "prompt": text}
-    start = time.perf_counter()
+def _get_kobert_cache():
+    global KOBERT_CACHE
+    if KOBERT_CACHE is None:
+        try:
+            dir_path = os.path.dirname(KOBERT_CACHE_PATH)
+            if dir_path:
+                os.makedirs(dir_path, exist_ok=True)
+            cache = sqlite3.connect(KOBERT_CACHE_PATH, check_same_thread=False)
+            cache.execute(
+                """
+                CREATE TABLE IF NOT EXISTS kobert_cache (
+                  key TEXT PRIMARY KEY,
+                  vec BLOB NOT NULL,
+                  created_at REAL NOT NULL
+                )
+                """
+            )
+            cache.execute(
+                "CREATE INDEX IF NOT EXISTS kobert_cache_created_at ON kobert_cache (created_at)"
+            )
+            cache.commit()
+        except (OSError, sqlite3.Error):
+            return None
+        KOBERT_CACHE = cache
+    return KOBERT_CACHE
+
+
+def _kobert_cache_key(text: str) -> str:
+    return hashlib.sha1(f"{KOBERT_MODEL_ID}:{KOBERT_VARIANT}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _kobert_cache_get(keys: List[str]) -> Dict[str, bytes]:
+    cache = _get_kobert_cache()
+    if cache is None or not keys:
+        return {}
+    placeholders = ",".join("?" for _ in keys)
+    cutoff = time.time() - KOBERT_CACHE_TTL_SEC if KOBERT_CACHE_TTL_SEC > 0 else 0
+    with KOBERT_CACHE_LOCK:
+        try:
+            rows = cache.execute(
+                f"SELECT key, vec FROM kobert_cache WHERE created_at >= ? AND key IN ({placeholders})",
+                (cutoff, *keys),
+            ).fetchall()
+        except sqlite3.Error:
+            return {}
+    return dict(rows)
+
+
+def _kobert_cache_put(entries: Dict[str, bytes]) -> None:
+    cache = _get_kobert_cache()
+    if cache is None or not entries:
+        return
+    now = time.time()
+    with KOBERT_CACHE_LOCK:
+        try:
+            cache.executemany(
+                "INSERT OR REPLACE INTO kobert_cache (key, vec, created_at) VALUES (?, ?, ?)",
+                [(key, vec, now) for key, vec in entries.items()],
+            )
+            if KOBERT_CACHE_TTL_SEC > 0:
+                cache.execute(
+                    "DELETE FROM kobert_cache WHERE created_at < ?",
+                    (now - KOBERT_CACHE_TTL_SEC,),
+                )
+            cache.commit()
+        except sqlite3.Error:
+            cache.rollback()
+
+
+def _response_json(res) -> dict:
     try:
-        res = requests.post(
+        return orjson.loads(res.content)
+    except orjson.JSONDecodeError as exc:
+        raise requests.exceptions.InvalidJSONError(str(exc), response=res) from exc
+
+
+def _embed_texts_legacy(texts: List[str]) -> Optional[List[list]]:
+    embeddings = []
+    for text in texts:
+        res = HTTP_SESSION.post(
             f"{OLLAMA_URL}/api/embeddings",
-            json=payload,
+            json={"model": OLLAMA_EMBED_MODEL, "prompt": text},
             timeout=EMBEDDING_TIMEOUT_SEC,
         )
         res.raise_for_status()
-        data = res.json()
+        embeddings.append(_response_json(res).get("embedding"))
+    return embeddings
+
+
+def _embed_texts(texts: List[str]) -> List[Optional[List[float]]]:
+    if not texts:
+        return []
+    payload = {"model": OLLAMA_EMBED_MODEL, "input": texts}
+    start = time.perf_counter()
+    try:
+        res = HTTP_SESSION.post(
+            f"{OLLAMA_URL}/api/embed",
+            json=payload,
+            timeout=EMBEDDING_TIMEOUT_SEC * max(1, len(texts) / 8),
+        )
+        if res.status_code == 404:
+            embeddings = _embed_texts_legacy(texts)
+        else:
+            res.raise_for_status()
+            embeddings = _response_json(res).get("embeddings")
+            if not isinstance(embeddings, list):
+                embeddings = _embed_texts_legacy(texts)
     except requests.RequestException:
         _log_event(
             "embedding_error",
-            {"model": OLLAMA_EMBED_MODEL, "error": "request_failed"},
+            {"model": OLLAMA_EMBED_MODEL, "error": "request_failed", "count": len(texts)},
         )
-        return None
+        return [None] * len(texts)
     elapsed_ms = int((time.perf_counter() - start) * 1000)
     _log_event(
         "embedding_latency",
-        {"model": OLLAMA_EMBED_MODEL, "elapsed_ms": elapsed_ms},
+        {"model": OLLAMA_EMBED_MODEL, "elapsed_ms": elapsed_ms, "count": len(texts)},
     )
-    embedding = data.get("embedding")
-    if not isinstance(embedding, list):
+    results: List[Optional[List[float]]] = []
+    for idx in range(len(texts)):
+        embedding = embeddings[idx] if idx < len(embeddings) else None
+        if not isinstance(embedding, list):
+            results.append(None)
+            continue
+        if EMBEDDING_DIM and len(embedding) != EMBEDDING_DIM:
+            _log_event(
+                "embedding_error",
+                {
+                    "model": OLLAMA_EMBED_MODEL,
+                    "error": "dimension_mismatch",
+                    "expected": EMBEDDING_DIM,
+                    "actual": len(embedding),
+                },
+            )
+            results.append(None)
+            continue
+        results.append(embedding)
+    return results
+
+
+def _embed_cache_key(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _embed_text(text: str) -> Optional[List[float]]:
+    if not text:
         return None
-    if EMBEDDING_DIM and len(embedding) != EMBEDDING_DIM:
-        _log_event(
-            "embedding_error",
-            {
-                "model": OLLAMA_EMBED_MODEL,
-                "error": "dimension_mismatch",
-                "expected": EMBEDDING_DIM,
-                "actual": len(embedding),
-            },
-        )
+    key = _embed_cache_key(text)
+    now = time.monotonic()
+    embedding = None
+    with EMBED_CACHE_LOCK:
+        entry = EMBED_CACHE.get(key)
+        if entry is not None and entry[0] > now:
+            EMBED_CACHE.move_to_end(key)
+            embedding = entry[1]
+            EMBED_CACHE_STATS["hits"] += 1
+        else:
+            EMBED_CACHE_STATS["misses"] += 1
+        hits = EMBED_CACHE_STATS["hits"]
+        total = hits + EMBED_CACHE_STATS["misses"]
+    _log_event("embed_cache", {"hit": embedding is not None, "hit_rate": round(hits / total, 4)})
+    if embedding is not None:
+        return embedding
+    embedding = _embed_texts([text])[0]
+    if embedding is None:
         return None
+    with EMBED_CACHE_LOCK:
+        EMBED_CACHE[key] = (now + EMBED_CACHE_TTL_SEC, embedding)
+        EMBED_CACHE.move_to_end(key)
+        while len(EMBED_CACHE) > EMBED_CACHE_MAX:
+            EMBED_CACHE.popitem(last=False)
     return embedding
 
 
+def _submit_embed(text: str) -> Future:
+    # The gate prefetch and retrieve_citations ask for the same context text;
+    # share the in-flight request instead of embedding it twice.
+    key = _embed_cache_key(text)
+    with EMBED_CACHE_LOCK:
+        future = EMBED_INFLIGHT.get(key)
+        if future is not None:
+            return future
+        future = EMBED_INFLIGHT[key] = EMBED_EXECUTOR.submit(_embed_text, text)
+    future.add_done_callback(lambda done: _forget_inflight_embed(key, done))
+    return future
+
+
+def _forget_inflight_embed(key: str, future: Future) -> None:
+    with EMBED_CACHE_LOCK:
+        if EMBED_INFLIGHT.get(key) is future:
+            del EMBED_INFLIGHT[key]
+
+
 def _tokenize(text: str) -> List[str]:
     normalized = normalize_text(text or "")
     if not normalized:
         return []
-    tokens = []
-    for token in normalized.split():
-        if token.isdigit():
-            continue
-        if len(token) < 2:
-            continue
-        tokens.append(token)
-    return tokens
+    return TOKEN_RE.findall(normalized)
 
 
 def _tokenize_morph(text: str) -> List[str]:
     normalized = normalize_text(text or "")
     if not normalized:
         return []
-    if not re.search(r"[가-힣]", normalized):
-        return _tokenize(normalized)
+    if not LANG_KO_RE.search(normalized):
+        return TOKEN_RE.findall(normalized)
     kiwi = _get_kiwi()
     if not kiwi:
-        return _tokenize(normalized)
+        return TOKEN_RE.findall(normalized)
     try:
         tokens = kiwi.tokenize(normalized)
     except Exception:
-        return _tokenize(normalized)
-    results = []
-    for token in tokens:
-        if token.tag not in KIWI_POS_TAGS:
-            continue
-        term = token.form
-        if term.isdigit() or len(term) < 2:
-            continue
-        results.append(term)
-    return results
+        return TOKEN_RE.findall(normalized)
+    return [
+        token.form
+        for token in tokens
+        if token.tag in KIWI_POS_TAGS and len(token.form) >= 2 and not token.form.isdigit()
+    ]
 
 
 def extract_keywords(text: str, limit: int = 6) -> List[str]:
@@ -535,28 +842,32 @@ def extract_keywords(text: str, limit: int = 6) -> List[str]:
 
 
 def extract_keywords_from_texts(texts: List[str], limit: int = 6) -> List[str]:
-    counts: Dict[str, int] = {}
+    counts: Counter = Counter()
     for text in texts:
-        tokens = _tokenize_morph(text)
-        for token in tokens:
-            counts[token] = counts.get(token, 0) + 1
-    ranked = sorted(counts.items(), key=lambda x: (-x[1], -len(x[0])))
-    return [tok for tok, _ in ranked[:limit]]
+        counts.update(_tokenize_morph(text))
+    ranked = heapq.nsmallest(limit, counts.items(), key=lambda x: (-x[1], -len(x[0])))
+    return [tok for tok, _ in ranked]
+
+
+def _keyword_labels(text: str) -> frozenset:
+    if not text:
+        return frozenset()
+    labels = set()
+    for _end, matched in GATING_AUTOMATON.iter(text.lower()):
+        labels.update(matched)
+    return frozenset(labels)
+
+
+def _topics_from_labels(labels: frozenset) -> List[str]:
+    return [topic for topic in TOPIC_LEXICON if f"topic:{topic}" in labels]
 
 
 def infer_topics(text: str) -> List[str]:
-    found = []
-    for topic, keywords in TOPIC_LEXICON.items():
-        for kw in keywords:
-            if kw in text:
-                found.append(topic)
-                break
-    return found
+    return _topics_from_labels(_keyword_labels(text))
 
 
 def _explicit_verse_request(text: str) -> bool:
-    lowered = (text or "").lower()
-    return any(keyword in lowered for keyword in VERSE_REQUEST_KEYWORDS)
+    return "verse_request" in _keyword_labels(text)
 
 
 def _expand_topics_to_terms(topics: List[str]) -> List[str]:
@@ -576,6 +887,20 @@ def _expand_topics_to_terms(topics: List[str]) -> List[str]:
 def _fetch_synonyms_from_db(conn, terms: List[str]) -> Dict[str, List[str]]:
     if conn is None or not terms:
         return {}
+    now = time.monotonic()
+    synonyms: Dict[str, List[str]] = {}
+    missing = []
+    with SYNONYM_CACHE_LOCK:
+        for term in dict.fromkeys(terms):
+            entry = SYNONYM_CACHE.get(term)
+            if entry is None or entry[0] <= now:
+                missing.append(term)
+                continue
+            SYNONYM_CACHE.move_to_end(term)
+            if entry[1]:
+                synonyms[term] = list(entry[1])
+    if not missing:
+        return synonyms
     try:
         with conn.cursor() as cur:
             cur.execute(
@@ -584,14 +909,22 @@ def _fetch_synonyms_from_db(conn, terms: List[str]) -> Dict[str, List[str]]:
                 FROM search_synonym
                 WHERE term = ANY(%s)
                 """,
-                (terms,),
+                (missing,),
             )
             rows = cur.fetchall()
     except Exception:
-        return {}
-    synonyms: Dict[str, List[str]] = {}
+        return synonyms
+    fetched: Dict[str, List[str]] = {}
     for term, synonym in rows:
-        synonyms.setdefault(term, []).append(synonym)
+        fetched.setdefault(term, []).append(synonym)
+    expires_at = now + SYNONYM_CACHE_TTL_SEC
+    with SYNONYM_CACHE_LOCK:
+        for term in missing:
+            SYNONYM_CACHE[term] = (expires_at, tuple(fetched.get(term, ())))
+            SYNONYM_CACHE.move_to_end(term)
+        while len(SYNONYM_CACHE) > SYNONYM_CACHE_MAX:
+            SYNONYM_CACHE.popitem(last=False)
+    synonyms.update(fetched)
     return synonyms
 
 
@@ -613,17 +946,6 @@ def _expand_synonyms(conn, terms: List[str], limit_per_term: int = 3) -> List[st
     return expanded
 
 
-def _dedupe_terms(terms: List[str]) -> List[str]:
-    seen = set()
-    deduped = []
-    for term in terms:
-        if term in seen:
-            continue
-        seen.add(term)
-        deduped.append(term)
-    return deduped
-
-
 def _passes_min_relevance(item: dict, score_terms: List[str]) -> bool:
     keyword_hits = int(item.get("keyword_hits") or 0)
     rank = float(item.get("rank") or 0.0)
@@ -638,21 +960,100 @@ def _passes_min_relevance(item: dict, score_terms: List[str]) -> bool:
 
 
 def _merge_candidates(fts_items: List[dict], vector_items: List[dict]) -> List[dict]:
+    # Items come straight from the search queries and are owned by the caller,
+    # so they are updated in place instead of copied.
     merged: Dict[tuple, dict] = {}
     for item in fts_items:
-        key = (item["book_id"], item["chapter"], item["verse"])
-        merged[key] = dict(item)
-        merged[key]["source"] = "fts"
+        item["source"] = "fts"
+        merged[(item["book_id"], item["chapter"], item["verse"])] = item
     for item in vector_items:
         key = (item["book_id"], item["chapter"], item["verse"])
-        if key in merged:
-            merged[key]["vector_distance"] = item.get("vector_distance")
-            merged[key]["source"] = "hybrid"
+        existing = merged.get(key)
+        if existing is not None:
+            existing["vector_distance"] = item.get("vector_distance")
+            existing["source"] = "hybrid"
         else:
-            merged[key] = dict(item)
+            merged[key] = item
     return list(merged.values())
 
 
+def _candidate_sort_key(item: dict) -> tuple:
+    vector_distance = item.get("vector_distance")
+    return (
+        -item["keyword_hits"],
+        -(item.get("rank") or 0.0),
+        -(item.get("trgm_sim") or 0.0),
+        vector_distance if vector_distance is not None else 9999.0,
+    )
+
+
+@lru_cache(maxsize=256)
+def _score_terms_automaton(score_terms: tuple):
+    automaton = ahocorasick.Automaton()
+    for term in score_terms:
+        automaton.add_word(term, term)
+    automaton.make_automaton()
+    return automaton
+
+
+@lru_cache(maxsize=VERSE_NORM_CACHE_MAX)
+def _normalize_verse_text(text: str) -> str:
+    return normalize_text(text)
+
+
+def _item_text_norm(item: dict) -> str:
+    text_norm = item.get("text_norm")
+    if not text_norm:
+        text_norm = item["text_norm"] = _normalize_verse_text(item["text"])
+    return text_norm
+
+
+def _count_keyword_hits(items: List[dict], score_terms: List[str]) -> None:
+    terms = tuple(dict.fromkeys(term for term in score_terms if term))
+    if not terms:
+        for item in items:
+            item["keyword_hits"] = 0
+        return
+    if len(terms) <= SCORE_TERMS_DIRECT_MAX:
+        for item in items:
+            text_norm = _item_text_norm(item)
+            item["keyword_hits"] = sum([term in text_norm for term in terms])
+        return
+    automaton = _score_terms_automaton(terms)
+    for item in items:
+        text_norm = _item_text_norm(item)
+        item["keyword_hits"] = len({term for _end, term in automaton.iter(text_norm)})
+
+
+def _sort_candidates(items: List[dict]) -> List[dict]:
+    if len(items) < 2:
+        items.sort(key=_candidate_sort_key)
+        return items
+    hits = np.fromiter((item["keyword_hits"] for item in items), dtype=np.int32, count=len(items))
+    ranks = np.fromiter((item.get("rank") or 0.0 for item in items), dtype=np.float64, count=len(items))
+    trgm = np.fromiter((item.get("trgm_sim") or 0.0 for item in items), dtype=np.float64, count=len(items))
+    vdist = np.fromiter(
+        (
+            item["vector_distance"] if item.get("vector_distance") is not None else 9999.0
+            for item in items
+        ),
+        dtype=np.float64,
+        count=len(items),
+    )
+    order = np.lexsort((np.arange(len(items)), vdist, -trgm, -ranks, -hits))
+    return [items[i] for i in order]
+
+
+def _fts_confident(fts_items: List[dict], keywords: List[str]) -> bool:
+    if not fts_items or not keywords:
+        return False
+    top = fts_items[0]
+    if (top.get("rank") or 0.0) < FTS_CONFIDENT_RANK:
+        return False
+    _count_keyword_hits([top], keywords)
+    return top["keyword_hits"] >= FTS_CONFIDENT_HITS
+
+
 def _candidate_key(item: dict) -> str:
     return f"{item['book_id']}:{item['chapter']}:{item['verse']}"
 
@@ -671,65 +1072,77 @@ def _rerank_delta(before: List[str], after: List[str]) -> List[dict]:
     return deltas
 
 
-def _recent_user_texts(recent_messages: Optional[List[dict]], limit: int = 3) -> List[str]:
-    if not recent_messages:
-        return []
-    user_texts = [m.get("content", "") for m in recent_messages if m.get("role") == "user"]
-    return [text for text in user_texts[-limit:] if text]
+def _context_and_recent(
+    user_message: str, summary: str, recent_messages: Optional[List[dict]], limit: int = 3
+) -> tuple[str, List[str]]:
+    recent_texts: List[str] = []
+    if recent_messages:
+        user_turns = 0
+        for message in reversed(recent_messages):
+            if message.get("role") != "user":
+                continue
+            text = message.get("content", "")
+            if text:
+                recent_texts.append(text)
+            user_turns += 1
+            if user_turns >= limit:
+                break
+        recent_texts.reverse()
+    if recent_texts and recent_texts[-1] == user_message:
+        recent_texts.pop()
+    parts = [user_message, *recent_texts, summary]
+    return " ".join(part for part in parts if part), recent_texts
 
 
 def _build_context_text(user_message: str, summary: str, recent_messages: Optional[List[dict]]) -> str:
-    parts = [user_message]
-    recent_texts = _recent_user_texts(recent_messages)
-    if recent_texts and recent_texts[-1] == user_message:
-        recent_texts = recent_texts[:-1]
-    parts.extend(recent_texts)
-    if summary:
-        parts.append(summary)
-    return " ".join(part for part in parts if part)
+    return _context_and_recent(user_message, summary, recent_messages)[0]
+
+
+def _scan_gating_keywords(text: str) -> dict:
+    labels = _keyword_labels(text)
+    return {
+        "topics": _topics_from_labels(labels),
+        "explicit": "verse_request" in labels,
+        "closing": "closing" in labels,
+        "info": "info" in labels or "?" in (text or ""),
+        "small_talk": "small_talk" in labels or bool(SMALL_TALK_PATTERN.search(text or "")),
+    }
 
 
-def _is_info_request(text: str, topics: List[str]) -> bool:
+def _is_info_request(text: str, topics: List[str], scan: Optional[dict] = None) -> bool:
     if not text:
         return False
     if topics:
         return False
-    if any(keyword in text for keyword in CLOSING_KEYWORDS):
+    scan = scan or _scan_gating_keywords(text)
+    if scan["closing"] or scan["explicit"]:
         return False
-    if _explicit_verse_request(text):
-        return False
-    lowered = text.lower()
-    if any(keyword in lowered for keyword in INFO_QUESTION_KEYWORDS):
-        return True
-    if "?" in text and not _explicit_verse_request(text):
-        return True
-    return False
+    return scan["info"]
 
 
-def _is_small_talk(text: str) -> bool:
+def _is_small_talk(text: str, scan: Optional[dict] = None) -> bool:
     if not text:
         return False
-    lowered = text.lower()
-    if any(keyword in text for keyword in CLOSING_KEYWORDS):
+    scan = scan or _scan_gating_keywords(text)
+    if scan["closing"] or scan["explicit"]:
         return False
-    if _explicit_verse_request(text):
-        return False
-    if SMALL_TALK_PATTERN.search(text):
-        return True
-    if any(keyword in lowered for keyword in SMALL_TALK_KEYWORDS):
-        return True
-    return False
+    return scan["small_talk"]
 
 
 def _rule_based_gating(
     user_message: str, summary: str, recent_messages: Optional[List[dict]]
 ) -> dict:
     context_text = _build_context_text(user_message, summary, recent_messages)
-    topics = infer_topics(context_text)
-    explicit_request = _explicit_verse_request(user_message) or _explicit_verse_request(context_text)
-    closing_stage = any(keyword in context_text for keyword in CLOSING_KEYWORDS)
-    info_request = _is_info_request(user_message, topics)
-    small_talk = _is_small_talk(user_message)
+    context_scan = _scan_gating_keywords(context_text)
+    if context_text == user_message:
+        message_scan = context_scan
+    else:
+        message_scan = _scan_gating_keywords(user_message)
+    topics = context_scan["topics"]
+    explicit_request = message_scan["explicit"] or context_scan["explicit"]
+    closing_stage = context_scan["closing"]
+    info_request = _is_info_request(user_message, topics, message_scan)
+    small_talk = _is_small_talk(user_message, message_scan)
 
     trigger_reason = []
     if explicit_request:
@@ -762,23 +1175,110 @@ def _rule_based_gating(
     }
 
 
+EVENT_QUEUE: "queue.SimpleQueue[bytes]" = queue.SimpleQueue()
+EVENT_FLUSHER = None
+EVENT_FLUSHER_LOCK = threading.Lock()
+EVENT_LOG_FILE = None
+EVENT_LOG_FILE_LOCK = threading.Lock()
+EVENT_PREFIXES: Dict[str, bytes] = {}
+EVENT_TS_SECOND = (0, "")
+
+
+def _event_log_file():
+    global EVENT_LOG_FILE
+    if EVENT_LOG_FILE is not None:
+        path, f = EVENT_LOG_FILE
+        try:
+            if path == EVENT_LOG_PATH and os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                return f
+        except OSError:
+            pass
+        EVENT_LOG_FILE = None
+        f.close()
+    dir_path = os.path.dirname(EVENT_LOG_PATH)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    f = open(EVENT_LOG_PATH, "ab")
+    EVENT_LOG_FILE = (EVENT_LOG_PATH, f)
+    return f
+
+
+def _write_event_lines(lines: List[bytes]) -> None:
+    with EVENT_LOG_FILE_LOCK:
+        try:
+            f = _event_log_file()
+            f.write(b"".join(lines))
+            f.flush()
+        except OSError:
+            pass
+
+
+def _drain_event_queue() -> List[bytes]:
+    lines = []
+    while True:
+        try:
+            lines.append(EVENT_QUEUE.get_nowait())
+        except queue.Empty:
+            break
+    return lines
+
+
+def _event_flusher() -> None:
+    while True:
+        lines = [EVENT_QUEUE.get()]
+        deadline = time.monotonic() + EVENT_LOG_FLUSH_SEC
+        while len(lines) < EVENT_LOG_BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                lines.append(EVENT_QUEUE.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _write_event_lines(lines)
+
+
+def _ensure_event_flusher() -> None:
+    global EVENT_FLUSHER
+    if EVENT_FLUSHER is not None and EVENT_FLUSHER.is_alive():
+        return
+    with EVENT_FLUSHER_LOCK:
+        if EVENT_FLUSHER is None or not EVENT_FLUSHER.is_alive():
+            EVENT_FLUSHER = threading.Thread(target=_event_flusher, name="event-log", daemon=True)
+            EVENT_FLUSHER.start()
+
+
+@atexit.register
+def flush_event_log() -> None:
+    lines = _drain_event_queue()
+    if lines:
+        _write_event_lines(lines)
+
+
+def _event_ts() -> str:
+    global EVENT_TS_SECOND
+    now = time.time()
+    second = int(now)
+    cached_second, formatted = EVENT_TS_SECOND
+    if second != cached_second:
+        formatted = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        EVENT_TS_SECOND = (second, formatted)
+    return f"{formatted}.{int((now - second) * 1_000_000):06d}+00:00"
+
+
 def _log_event(event_type: str, payload: dict) -> None:
-    try:
-        dir_path = os.path.dirname(EVENT_LOG_PATH)
-        if dir_path:
-            os.makedirs(dir_path, exist_ok=True)
-        safe_payload = dict(payload or {})
-        if safe_payload.get("conversation_id"):
-            safe_payload["conversation_id"] = _hash_id(str(safe_payload["conversation_id"]))
-        record = {
-            "event_type": event_type,
-            "ts": datetime.now(timezone.utc).isoformat(),
-            **safe_payload,
-        }
-        with open(EVENT_LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(json.dumps(record, ensure_ascii=True) + "\n")
-    except OSError:
-        pass
+    if payload and payload.get("conversation_id"):
+        payload = {**payload, "conversation_id": _hash_id(str(payload["conversation_id"]))}
+    ts = _event_ts()
+    prefix = EVENT_PREFIXES.get(event_type)
+    if prefix is None:
+        prefix = EVENT_PREFIXES[event_type] = orjson.dumps({"event_type": event_type})[:-1] + b',"ts":"'
+    if payload:
+        line = prefix + ts.encode() + b'",' + orjson.dumps(payload, option=orjson.OPT_APPEND_NEWLINE)[1:]
+    else:
+        line = prefix + ts.encode() + b'"}\n'
+    EVENT_QUEUE.put(line)
+    _ensure_event_flusher()
 
 
 def log_chat_event(event_type: str, payload: dict) -> None:
@@ -786,18 +1286,24 @@ def log_chat_event(event_type: str, payload: dict) -> None:
 
 
 def log_verse_cited(conversation_id: str, citations: List[dict]) -> None:
-    for c in citations:
-        _log_event(
-            "verse_cited",
-            {
-                "conversation_id": conversation_id,
-                "version_id": c.get("version_id"),
-                "book_id": c.get("book_id"),
-                "chapter": c.get("chapter"),
-                "verse_start": c.get("verse_start"),
-                "verse_end": c.get("verse_end"),
-            },
-        )
+    if not citations:
+        return
+    _log_event(
+        "verse_cited_batch",
+        {
+            "conversation_id": conversation_id,
+            "items": [
+                {
+                    "version_id": c.get("version_id"),
+                    "book_id": c.get("book_id"),
+                    "chapter": c.get("chapter"),
+                    "verse_start": c.get("verse_start"),
+                    "verse_end": c.get("verse_end"),
+                }
+                for c in citations
+            ],
+        },
+    )
 
 
 def log_search_event(event_type: str, payload: dict) -> None:
@@ -809,6 +1315,7 @@ def log_api_event(event_type: str, payload: dict) -> None:
 
 
 def reset_event_log(reason: str = "startup", payload: Optional[dict] = None) -> None:
+    _drain_event_queue()
     try:
         dir_path = os.path.dirname(EVENT_LOG_PATH)
         if dir_path:
@@ -823,14 +1330,71 @@ def reset_event_log(reason: str = "startup", payload: Optional[dict] = None) ->
         pass
 
 
-def generate_with_ollama(prompt: str) -> Optional[str]:
+def _llm_cache_key(provider: str, model: str, prompt: str, api_key: str = "") -> tuple:
+    # Per-user OpenAI keys are part of the key so one user's key never pays for
+    # (or stands in for) another user's completion.
+    key_id = hashlib.blake2b(api_key.encode("utf-8"), digest_size=8).digest() if api_key else b""
+    return provider, model, key_id, hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).digest()
+
+
+def _llm_cache_get(key: tuple) -> Optional[str]:
+    if LLM_CACHE_MAX <= 0:
+        return None
+    now = time.monotonic()
+    response = None
+    with LLM_CACHE_LOCK:
+        entry = LLM_CACHE.get(key)
+        if entry is not None and entry[0] > now:
+            LLM_CACHE.move_to_end(key)
+            response = entry[1]
+            LLM_CACHE_STATS["hits"] += 1
+        else:
+            LLM_CACHE_STATS["misses"] += 1
+        hits = LLM_CACHE_STATS["hits"]
+        total = hits + LLM_CACHE_STATS["misses"]
+    _log_event(
+        "llm_cache",
+        {"provider": key[0], "model": key[1], "hit": response is not None, "hit_rate": round(hits / total, 4)},
+    )
+    return response
+
+
+def _llm_cache_put(key: tuple, response: str) -> None:
+    if LLM_CACHE_MAX <= 0:
+        return
+    with LLM_CACHE_LOCK:
+        LLM_CACHE[key] = (time.monotonic() + LLM_CACHE_TTL_SEC, response)
+        LLM_CACHE.move_to_end(key)
+        while len(LLM_CACHE) > LLM_CACHE_MAX:
+            LLM_CACHE.popitem(last=False)
+
+
+def cache_stats() -> dict:
+    stats = {}
+    for name, cache, lock, counters in (
+        ("embed", EMBED_CACHE, EMBED_CACHE_LOCK, EMBED_CACHE_STATS),
+        ("rerank", RERANK_CACHE, RERANK_CACHE_LOCK, RERANK_CACHE_STATS),
+        ("llm", LLM_CACHE, LLM_CACHE_LOCK, LLM_CACHE_STATS),
+    ):
+        with lock:
+            stats[name] = {"size": len(cache), **counters}
+    return stats
+
+
+def generate_with_ollama(prompt: str, cache: bool = True) -> Optional[str]:
+    cache_key = _llm_cache_key("ollama", OLLAMA_MODEL, prompt) if cache else None
+    cached = _llm_cache_get(cache_key) if cache_key else None
+    if cached is not None:
+        return cached
     url = f"{OLLAMA_URL}/api/generate"
     payload = {"model": OLLAMA_MODEL, "prompt": prompt, "stream": False}
+    if OLLAMA_KEEP_ALIVE:
+        payload["keep_alive"] = OLLAMA_KEEP_ALIVE
     start = time.perf_counter()
     try:
-        res = requests.post(url, json=payload, timeout=OLLAMA_TIMEOUT_SEC)
+        res = HTTP_SESSION.post(url, json=payload, timeout=OLLAMA_TIMEOUT_SEC)
         res.raise_for_status()
-        data = res.json()
+        data = _response_json(res)
     except requests.RequestException:
         _log_event(
             "llm_error",
@@ -847,7 +1411,10 @@ def generate_with_ollama(prompt: str) -> Optional[str]:
             "llm_slow",
             {"model": OLLAMA_MODEL, "elapsed_ms": elapsed_ms},
         )
-    return data.get("response") or None
+    response = data.get("response") or None
+    if response and cache_key:
+        _llm_cache_put(cache_key, response)
+    return response
 
 
 def _openai_available(api_key: str | None = None) -> bool:
@@ -863,10 +1430,14 @@ def openai_llm_enabled(api_key: str | None = None) -> bool:
     return _openai_available(api_key)
 
 
-def generate_with_openai(prompt: str, api_key: str | None = None) -> Optional[str]:
+def generate_with_openai(prompt: str, api_key: str | None = None, cache: bool = True) -> Optional[str]:
     key = api_key or OPENAI_API_KEY
     if not key:
         return None
+    cache_key = _llm_cache_key("openai", OPENAI_MODEL, prompt, key) if cache else None
+    cached = _llm_cache_get(cache_key) if cache_key else None
+    if cached is not None:
+        return cached
     url = f"{OPENAI_BASE_URL.rstrip('/')}/v1/chat/completions"
     payload = {
         "model": OPENAI_MODEL,
@@ -880,9 +1451,9 @@ def generate_with_openai(prompt: str, api_key: str | None = None) -> Optional[st
     }
     start = time.perf_counter()
     try:
-        res = requests.post(url, json=payload, headers=headers, timeout=OPENAI_TIMEOUT_SEC)
+        res = HTTP_SESSION.post(url, json=payload, headers=headers, timeout=OPENAI_TIMEOUT_SEC)
         res.raise_for_status()
-        data = res.json()
+        data = _response_json(res)
     except requests.RequestException:
         _log_event(
             "llm_error",
@@ -904,7 +1475,10 @@ def generate_with_openai(prompt: str, api_key: str | None = None) -> Optional[st
         return None
     message = choices[0].get("message") or {}
     content = message.get("content")
-    return content.strip() if isinstance(content, str) else None
+    response = content.strip() if isinstance(content, str) else None
+    if response and cache_key:
+        _llm_cache_put(cache_key, response)
+    return response
 
 
 def generate_with_llm(
@@ -912,14 +1486,15 @@ def generate_with_llm(
     use_openai: bool = False,
     openai_api_key: str | None = None,
     model_info: Optional[dict] = None,
+    cache: bool = True,
 ) -> Optional[str]:
     if use_openai and _openai_available(openai_api_key):
-        response = generate_with_openai(prompt, openai_api_key)
+        response = generate_with_openai(prompt, openai_api_key, cache=cache)
         if response:
             if model_info is not None:
                 model_info.update({"provider": "openai", "model": OPENAI_MODEL})
             return response
-    response = generate_with_ollama(prompt)
+    response = generate_with_ollama(prompt, cache=cache)
     if response and model_info is not None:
         model_info.update({"provider": "ollama", "model": OLLAMA_MODEL})
     return response
@@ -961,12 +1536,9 @@ def _rerank_with_llm(
             scores[idx - 1] = score
     if not scores:
         return None
-    reranked = []
-    for idx, item in enumerate(limited):
-        score = scores.get(idx, 0.0)
-        enriched = dict(item)
-        enriched["rerank_score"] = score
-        reranked.append(enriched)
+    reranked = limited
+    for idx, item in enumerate(reranked):
+        item["rerank_score"] = scores.get(idx, 0.0)
     reranked.sort(key=lambda x: (-x.get("rerank_score", 0.0), x.get("vector_distance", 9999.0)))
     return reranked + candidates[len(limited) :]
 
@@ -977,27 +1549,75 @@ def _rerank_with_kobert(context_text: str, candidates: List[dict]) -> Optional[L
         return None
     try:
         import torch
-        from torch.nn.functional import cosine_similarity
     except Exception:
         return None
     limited = candidates[:RERANK_CANDIDATES]
-    with torch.no_grad():
+    keys = [_kobert_cache_key(item["text"]) for item in limited]
+    vectors = _kobert_cache_get(keys)
+    fresh: Dict[str, bytes] = {}
+    missing: Dict[str, str] = {}
+    for item, key in zip(limited, keys):
+        if key not in vectors:
+            missing.setdefault(key, item["text"])
+    missing_keys = list(missing)
+    with torch.inference_mode():
         ctx = tokenizer(context_text, return_tensors="pt", truncation=True, max_length=256)
         ctx_out = model(**ctx)
-        ctx_vec = ctx_out.last_hidden_state[:, 0]
-        reranked = []
-        for item in limited:
-            inputs = tokenizer(item["text"], return_tensors="pt", truncation=True, max_length=256)
+        ctx_vec = ctx_out.last_hidden_state[0, 0].numpy().astype(np.float32)
+        for offset in range(0, len(missing_keys), KOBERT_BATCH_SIZE):
+            batch_keys = missing_keys[offset : offset + KOBERT_BATCH_SIZE]
+            inputs = tokenizer(
+                [missing[key] for key in batch_keys],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=256,
+            )
             outputs = model(**inputs)
-            vec = outputs.last_hidden_state[:, 0]
-            score = float(cosine_similarity(ctx_vec, vec).item())
-            enriched = dict(item)
-            enriched["rerank_score"] = score
-            reranked.append(enriched)
+            cls = outputs.last_hidden_state[:, 0].numpy().astype(np.float32)
+            for key, vec in zip(batch_keys, cls):
+                fresh[key] = vec.tobytes()
+    _kobert_cache_put(fresh)
+    vectors.update(fresh)
+    vecs = np.stack([np.frombuffer(vectors[key], dtype=np.float32) for key in keys])
+    norms = np.maximum(np.linalg.norm(vecs, axis=1), 1e-8) * max(np.linalg.norm(ctx_vec), 1e-8)
+    scores = (vecs @ ctx_vec) / norms
+    reranked = limited
+    for item, score in zip(reranked, scores):
+        item["rerank_score"] = float(score)
     reranked.sort(key=lambda x: (-x.get("rerank_score", 0.0), x.get("vector_distance", 9999.0)))
     return reranked + candidates[len(limited) :]
 
 
+def _rerank_cache_key(mode: str, context_text: str, candidates: List[dict]) -> tuple:
+    digest = hashlib.blake2b(f"{mode}\0{context_text}".encode("utf-8"), digest_size=16).digest()
+    return digest, tuple((item["book_id"], item["chapter"], item["verse"]) for item in candidates)
+
+
+def _rerank_cache_get(key: tuple) -> Optional[tuple]:
+    with RERANK_CACHE_LOCK:
+        scores = RERANK_CACHE.get(key)
+        if scores is not None:
+            RERANK_CACHE.move_to_end(key)
+            RERANK_CACHE_STATS["hits"] += 1
+        else:
+            RERANK_CACHE_STATS["misses"] += 1
+        hits = RERANK_CACHE_STATS["hits"]
+        total = hits + RERANK_CACHE_STATS["misses"]
+    _log_event("rerank_cache", {"hit": scores is not None, "hit_rate": round(hits / total, 4)})
+    return scores
+
+
+def _rerank_cache_put(key: tuple, scores: tuple) -> None:
+    if RERANK_CACHE_MAX <= 0:
+        return
+    with RERANK_CACHE_LOCK:
+        RERANK_CACHE[key] = scores
+        RERANK_CACHE.move_to_end(key)
+        while len(RERANK_CACHE) > RERANK_CACHE_MAX:
+            RERANK_CACHE.popitem(last=False)
+
+
 def _rerank_candidates(
     context_text: str,
     candidates: List[dict],
@@ -1006,35 +1626,64 @@ def _rerank_candidates(
 ) -> List[dict]:
     if not candidates:
         return candidates
+    top = max(
+        candidates,
+        key=lambda x: (x.get("keyword_hits") or 0, x.get("rank") or 0.0, x.get("trgm_sim") or 0.0),
+    )
+    if (top.get("keyword_hits") or 0) >= RERANK_SKIP_KEYWORD_HITS or (
+        top.get("trgm_sim") or 0.0
+    ) >= RERANK_SKIP_TRGM:
+        _log_event(
+            "rerank_skipped",
+            {
+                "keyword_hits": top.get("keyword_hits") or 0,
+                "trgm_sim": top.get("trgm_sim") or 0.0,
+            },
+        )
+        return candidates
     mode = (RERANK_MODE or "ko-bert").lower()
+    if mode not in ("ko-bert", "llm"):
+        return candidates
+    limited = candidates[:RERANK_CANDIDATES]
+    cache_key = _rerank_cache_key(f"{mode}:{int(use_openai)}", context_text, limited)
+    scores = _rerank_cache_get(cache_key)
+    if scores is not None:
+        for item, score in zip(limited, scores):
+            item["rerank_score"] = score
+        limited.sort(key=lambda x: (-x.get("rerank_score", 0.0), x.get("vector_distance", 9999.0)))
+        return limited + candidates[len(scores) :]
     if mode == "ko-bert":
         reranked = _rerank_with_kobert(context_text, candidates)
-        if reranked:
-            return reranked
-    if mode == "llm":
+    else:
         reranked = _rerank_with_llm(
             context_text,
             candidates,
             use_openai=use_openai,
             openai_api_key=openai_api_key,
         )
-        if reranked:
-            return reranked
-    return candidates
+    if not reranked:
+        return candidates
+    _rerank_cache_put(cache_key, tuple(item.get("rerank_score", 0.0) for item in limited))
+    return reranked
+
+
+JSON_DECODER = json.JSONDecoder()
 
 
 def _extract_json(text: str) -> Optional[dict]:
     try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        pass
-    if "{" in text and "}" in text:
-        start = text.find("{")
-        end = text.rfind("}")
+        data = orjson.loads(text)
+    except orjson.JSONDecodeError:
+        data = None
+    if isinstance(data, dict):
+        return data
+    start = text.find("{")
+    while start != -1:
         try:
-            return json.loads(text[start : end + 1])
+            data, _end = JSON_DECODER.raw_decode(text, start)
+            return data
         except json.JSONDecodeError:
-            return None
+            start = text.find("{", start + 1)
     return None
 
 
@@ -1044,8 +1693,35 @@ def gate_need_verse(
     recent_messages: Optional[List[dict]] = None,
     use_openai: bool = False,
     openai_api_key: str | None = None,
+    on_llm_gate: Optional[Callable[[], None]] = None,
 ) -> dict:
+    rule = _rule_based_gating(user_message, summary, recent_messages)
+    if rule["need_verse"] is not None:
+        _log_event(
+            "gate_short_circuit",
+            {
+                "need_verse": rule["need_verse"],
+                "trigger_reason": rule["trigger_reason"],
+                "exclude_reason": rule["exclude_reason"],
+            },
+        )
+        return {
+            "need_verse": rule["need_verse"],
+            "topics": rule["topics"],
+            "user_goal": "",
+            "risk_flags": [],
+            "llm_ok": False,
+            "source": "rule",
+            "trigger_reason": rule["trigger_reason"],
+            "exclude_reason": rule["exclude_reason"],
+        }
     context_text = _build_context_text(user_message, summary, recent_messages)
+    if VECTOR_ENABLED:
+        # retrieve_citations embeds the same context text; warm the embed cache
+        # while the gating LLM call is in flight.
+        _submit_embed(context_text)
+    if on_llm_gate is not None:
+        on_llm_gate()
     prompt = (
         "Return ONLY JSON. Decide if a Bible verse citation is needed.\n"
         f"Summary: {summary}\n"
@@ -1055,7 +1731,6 @@ def gate_need_verse(
     )
     response = generate_with_llm(prompt, use_openai=use_openai, openai_api_key=openai_api_key)
     data = _extract_json(response or "")
-    rule = _rule_based_gating(user_message, summary, recent_messages)
     if data and isinstance(data, dict):
         data.setdefault("risk_flags", [])
         data.setdefault("topics", [])
@@ -1063,9 +1738,6 @@ def gate_need_verse(
         data.setdefault("llm_ok", True)
         data.setdefault("source", "llm")
         data["topics"] = list(dict.fromkeys(data["topics"] + rule["topics"]))
-        if rule["need_verse"] is not None:
-            data["need_verse"] = rule["need_verse"]
-            data["source"] = "rule"
         data["trigger_reason"] = rule["trigger_reason"]
         data["exclude_reason"] = rule["exclude_reason"]
         return data
@@ -1088,7 +1760,9 @@ def summarize_messages(
     use_openai: bool = False,
     openai_api_key: str | None = None,
 ) -> str:
-    joined = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    # previous_summary already covers older turns; only the tail goes in the prompt.
+    tail = messages[-SUMMARY_TRIGGER_TURNS:]
+    joined = "\n".join(f"{m['role']}: {m['content']}" for m in tail)
     prompt = (
         "Summarize the conversation in Korean within 800 characters. "
         "Include: user situation, emotions, repeated concerns, and preferences.\n"
@@ -1098,7 +1772,7 @@ def summarize_messages(
     if response:
         return response.strip()[:SUMMARY_MAX_CHARS]
     # Fallback summary: last few user lines only
-    user_lines = [m["content"] for m in messages if m["role"] == "user"]
+    user_lines = [m["content"] for m in tail if m["role"] == "user"]
     return " / ".join(user_lines[-3:])[:SUMMARY_MAX_CHARS]
 
 
@@ -1144,11 +1818,14 @@ def build_assistant_message(
         f"{citation_rule}"
         f"{'Bible verses:\\n' + citation_block + '\\n' if citation_block else ''}"
     )
+    # Counselling replies embed the user's own conversation; never serve one
+    # user's reply to another, so this prompt bypasses the LLM cache.
     response = generate_with_llm(
         prompt,
         use_openai=use_openai,
         openai_api_key=openai_api_key,
         model_info=model_info,
+        cache=False,
     )
     if response:
         return response.strip(), True
@@ -1170,37 +1847,57 @@ FALLBACK_REFERENCES = [
 ]
 
 
-def _fallback_citations(conn, version_id: str, limit: int) -> List[dict]:
-    citations = []
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        for ref in FALLBACK_REFERENCES:
-            cur.execute(
-                """
-                SELECT v.book_id, b.ko_name AS book_name, v.chapter, v.verse, v.text
-                FROM bible_verse v
-                JOIN bible_book b
-                  ON b.version_id = v.version_id AND b.book_id = v.book_id
-                WHERE v.version_id = %s AND v.book_id = %s AND v.chapter = %s AND v.verse = %s
-                """,
-                (version_id, ref["book_id"], ref["chapter"], ref["verse"]),
-            )
-            row = cur.fetchone()
-            if not row:
-                continue
-            citations.append(
-                {
-                    "version_id": version_id,
-                    "book_id": row["book_id"],
-                    "book_name": row["book_name"],
-                    "chapter": row["chapter"],
-                    "verse_start": row["verse"],
-                    "verse_end": row["verse"],
-                    "text": row["text"],
-                }
-            )
-            if len(citations) >= limit:
-                return citations
+FALLBACK_REFS_CACHE: Dict[str, tuple] = {}
 
+
+def _fallback_refs_for(conn, version_id: str) -> tuple:
+    cached = FALLBACK_REFS_CACHE.get(version_id)
+    if cached is not None:
+        return cached
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(FALLBACK_REFERENCES))
+    params: list = []
+    for idx, ref in enumerate(FALLBACK_REFERENCES):
+        params.extend([idx, ref["book_id"], ref["chapter"], ref["verse"]])
+    params.append(version_id)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT v.book_id, b.ko_name AS book_name, v.chapter, v.verse, v.text
+            FROM (VALUES {values}) AS refs(ord, book_id, chapter, verse)
+            JOIN bible_verse v
+              ON v.version_id = %s
+             AND v.book_id = refs.book_id
+             AND v.chapter = refs.chapter
+             AND v.verse = refs.verse
+            JOIN bible_book b
+              ON b.version_id = v.version_id AND b.book_id = v.book_id
+            ORDER BY refs.ord
+            """,
+            params,
+        )
+        ref_rows = cur.fetchall()
+    citations = tuple(
+        {
+            "version_id": version_id,
+            "book_id": book_id,
+            "book_name": book_name,
+            "chapter": chapter,
+            "verse_start": verse,
+            "verse_end": verse,
+            "text": text,
+        }
+        for book_id, book_name, chapter, verse, text in ref_rows
+    )
+    if citations:
+        FALLBACK_REFS_CACHE[version_id] = citations
+    return citations
+
+
+def _fallback_citations(conn, version_id: str, limit: int) -> List[dict]:
+    citations = [dict(c) for c in _fallback_refs_for(conn, version_id)[:limit]]
+    if len(citations) >= limit:
+        return citations
+    with conn.cursor() as cur:
         cur.execute(
             """
             SELECT v.book_id, b.ko_name AS book_name, v.chapter, v.verse, v.text
@@ -1214,16 +1911,16 @@ def _fallback_citations(conn, version_id: str, limit: int) -> List[dict]:
             (version_id, limit),
         )
         rows = cur.fetchall()
-    for row in rows:
+    for book_id, book_name, chapter, verse, text in rows:
         citations.append(
             {
                 "version_id": version_id,
-                "book_id": row["book_id"],
-                "book_name": row["book_name"],
-                "chapter": row["chapter"],
-                "verse_start": row["verse"],
-                "verse_end": row["verse"],
-                "text": row["text"],
+                "book_id": book_id,
+                "book_name": book_name,
+                "chapter": chapter,
+                "verse_start": verse,
+                "verse_end": verse,
+                "text": text,
             }
         )
     return citations
@@ -1239,18 +1936,18 @@ def retrieve_citations(
     use_openai: bool = False,
     openai_api_key: str | None = None,
 ) -> tuple[List[dict], dict]:
-    context_text = _build_context_text(user_message, summary, recent_messages)
-    recent_texts = _recent_user_texts(recent_messages)
-    if recent_texts and recent_texts[-1] == user_message:
-        recent_texts = recent_texts[:-1]
-    keyword_sources = [user_message] + recent_texts + ([summary] if summary else [])
+    context_text, recent_texts = _context_and_recent(user_message, summary, recent_messages)
+    embed_future = _submit_embed(context_text) if VECTOR_ENABLED else None
+    cache_namespace = (version_id, limit)
+    keyword_sources = [user_message, *recent_texts]
+    if summary:
+        keyword_sources.append(summary)
     keywords = extract_keywords_from_texts(keyword_sources, limit=8)
     topics = infer_topics(context_text)
     topic_terms = _expand_topics_to_terms(topics)
-    primary_terms = _dedupe_terms(keywords + topic_terms)
-    primary_terms = primary_terms[:MAX_QUERY_TERMS]
-    synonyms = _expand_synonyms(conn, primary_terms)
-    synonyms = synonyms[: max(0, MAX_QUERY_TERMS - len(primary_terms))]
+    primary_terms = list(islice(dict.fromkeys(chain(keywords, topic_terms)), MAX_QUERY_TERMS))
+    synonym_budget = MAX_QUERY_TERMS - len(primary_terms)
+    synonyms = _expand_synonyms(conn, primary_terms)[:synonym_budget] if synonym_budget > 0 else []
     query_text = " ".join(primary_terms) if primary_terms else user_message
     selection_reason = "fts_rank"
     if keywords:
@@ -1272,8 +1969,20 @@ def retrieve_citations(
         "failure_reason": "",
     }
 
+    if embed_future is not None and citation_cache.enabled:
+        cached = citation_cache.get(cache_namespace, embed_future.result())
+        if cached is not None:
+            cached_citations, cached_meta = cached
+            _log_event("semantic_cache_hit", {"version_id": version_id})
+            return [dict(c) for c in cached_citations], {**cached_meta, "semantic_cache": "hit"}
+
+    fts_queries = [query_text]
+    if synonyms:
+        fts_queries.append(" ".join(synonyms))
+    if query_text != user_message:
+        fts_queries.append(user_message)
     start = time.perf_counter()
-    results = search_verses(conn, version_id, query_text, limit * 3, 0)
+    fts_branch, fts_items = search_verses_first_hit(conn, version_id, fts_queries, limit * 3)
     elapsed_ms = int((time.perf_counter() - start) * 1000)
     _log_event(
         "retrieval_latency",
@@ -1284,27 +1993,21 @@ def retrieve_citations(
             "retrieval_slow",
             {"version_id": version_id, "elapsed_ms": elapsed_ms, "q": query_text},
         )
+    for zero_query in fts_queries if fts_branch < 0 else fts_queries[:fts_branch]:
+        _log_event("retrieval_zero", {"version_id": version_id, "q": zero_query})
+    effective_branch = fts_branch if fts_branch >= 0 else len(fts_queries) - 1
+    if effective_branch > 0:
+        meta["query_text_original"] = fts_queries[effective_branch - 1]
+        meta["query_text"] = fts_queries[effective_branch]
 
     vector_items: List[dict] = []
-
-    if results.get("total", 0) == 0 and synonyms:
-        _log_event("retrieval_zero", {"version_id": version_id, "q": query_text})
-        synonym_query = " ".join(synonyms)
-        results = search_verses(conn, version_id, synonym_query, limit * 3, 0)
-        meta["query_text_original"] = query_text
-        meta["query_text"] = synonym_query
-    if results.get("total", 0) == 0 and query_text != user_message:
-        _log_event("retrieval_zero", {"version_id": version_id, "q": meta["query_text"]})
-        results = search_verses(conn, version_id, user_message, limit * 3, 0)
-        meta["query_text_original"] = meta["query_text"]
-        meta["query_text"] = user_message
-    if results.get("total", 0) == 0:
-        _log_event("retrieval_zero", {"version_id": version_id, "q": user_message})
-
-    fts_items = results.get("items", [])
     meta["fts_candidates"] = len(fts_items)
-    if VECTOR_ENABLED and meta["fts_candidates"] > 0:
-        embed = _embed_text(context_text)
+    if VECTOR_ENABLED and _fts_confident(fts_items, keywords):
+        meta["vector_skipped"] = "fts_confident"
+    elif VECTOR_ENABLED and meta["fts_candidates"] > 0:
+        embed_start = time.perf_counter()
+        embed = embed_future.result()
+        meta["embed_wait_ms"] = int((time.perf_counter() - embed_start) * 1000)
         if embed:
             vec_start = time.perf_counter()
             vector_items = search_verses_vector(
@@ -1325,7 +2028,7 @@ def retrieve_citations(
     elif VECTOR_ENABLED:
         meta["vector_skipped"] = "fts_empty"
     meta["vector_candidates"] = len(vector_items)
-    if VECTOR_ENABLED and not vector_items:
+    if VECTOR_ENABLED and not vector_items and meta.get("vector_skipped") != "fts_confident":
         _log_event(
             "vector_zero",
             {"version_id": version_id, "window_size": VECTOR_WINDOW_SIZE},
@@ -1333,20 +2036,11 @@ def retrieve_citations(
     items = _merge_candidates(fts_items, vector_items)
     meta["total_candidates"] = len(items)
     score_terms = keywords or topic_terms or synonyms
-    scored = []
-    for idx, item in enumerate(items):
+    for item in items:
         item.setdefault("source", "fts")
-        text_norm = normalize_text(item["text"])
-        keyword_hits = sum(1 for kw in score_terms if kw in text_norm) if score_terms else 0
-        item["keyword_hits"] = keyword_hits
-        vector_distance = item.get("vector_distance")
-        vector_rank = vector_distance if vector_distance is not None else 9999.0
-        rank = item.get("rank") or 0.0
-        trgm_sim = item.get("trgm_sim") or 0.0
-        scored.append((keyword_hits, -rank, -trgm_sim, vector_rank, idx, item))
+    _count_keyword_hits(items, score_terms)
     if score_terms or vector_items:
-        scored.sort(key=lambda x: (-x[0], x[1], x[2], x[3], x[4]))
-        items = [item for *_rest, item in scored]
+        items = _sort_candidates(items)
 
     pre_rerank_order = _candidate_order(items)
     meta["rerank_mode"] = RERANK_MODE.lower()
@@ -1409,57 +2103,74 @@ def retrieve_citations(
         else:
             meta["failure_reason"] = "below_threshold"
         return [], meta
+    # With the cache enabled the lookup above already waited on the embedding;
+    # without it, a skipped vector step must not block on Ollama just to store.
+    if embed_future is not None and citation_cache.enabled:
+        context_embed = embed_future.result()
+        if context_embed:
+            citation_cache.put(cache_namespace, context_embed, ([dict(c) for c in citations], dict(meta)))
     return citations, meta
 
 
-def _format_citation(citation: dict) -> str:
+@lru_cache(maxsize=4096)
+def _format_citation_parts(book_name: str, chapter: int, verse_start: int, verse_end: int, text: str) -> str:
     verse_label = (
-        f"{citation['chapter']}:{citation['verse_start']}-{citation['verse_end']}"
-        if citation.get("verse_end", citation["verse_start"]) > citation["verse_start"]
-        else f"{citation['chapter']}:{citation['verse_start']}"
+        f"{chapter}:{verse_start}-{verse_end}" if verse_end > verse_start else f"{chapter}:{verse_start}"
     )
-    return f"({citation['book_name']} {verse_label}) {citation['text']}"
+    return f"({book_name} {verse_label}) {text}"
 
 
-def append_citations_to_response(response: str, citations: List[dict]) -> str:
-    if not citations:
-        return response
+def _format_citation(citation: dict) -> str:
+    return _format_citation_parts(
+        citation["book_name"],
+        citation["chapter"],
+        citation["verse_start"],
+        citation.get("verse_end", citation["verse_start"]),
+        citation["text"],
+    )
 
-    blocks = []
-    for c in citations:
-        blocks.append(_format_citation(c))
 
-    citation_text = "\n\n".join(blocks)
-    if citation_text in response:
+def format_citations(citations: List[dict]) -> str:
+    return "\n\n".join(_format_citation(c) for c in citations)
+
+
+def _ensure_citations_appended(
+    response: str, citations: List[dict], citation_text: Optional[str] = None, strip: bool = False
+) -> str:
+    if not citations:
         return response
+    if citation_text is None:
+        citation_text = format_citations(citations)
+    response = response or ""
+    if response.find(citation_text) != -1:
+        return response
+    if strip:
+        response = _strip_citation_lines(response)
     if response:
         return f"{response}\n\n{citation_text}"
     return citation_text
 
 
+def append_citations_to_response(
+    response: str, citations: List[dict], citation_text: Optional[str] = None
+) -> str:
+    return _ensure_citations_appended(response, citations, citation_text)
+
+
 def _strip_citation_lines(text: str) -> str:
     if not text:
         return ""
+    if "(" not in text or ":" not in text:
+        return text.strip()
     lines = []
-    pattern = re.compile(r"^\([^)]*\d+\s*:\s*\d+(?:\s*-\s*\d+)?\)[\s\S]*$")
     for line in text.splitlines():
-        if pattern.match(line.strip()):
+        if CITATION_LINE_RE.match(line.strip()):
             continue
         lines.append(line)
     return "\n".join(lines).strip()
 
 
-def enforce_exact_citations(response: str, citations: List[dict]) -> tuple[str, List[dict]]:
-    if not citations:
-        return response, citations
-
-    expected_blocks = [_format_citation(c) for c in citations]
-    expected_text = "\n\n".join(expected_blocks)
-
-    if expected_text in (response or ""):
-        return response, citations
-
-    stripped = _strip_citation_lines(response or "")
-    if stripped:
-        return f"{stripped}\n\n{expected_text}", citations
-    return expected_text, citations
+def enforce_exact_citations(
+    response: str, citations: List[dict], expected_text: Optional[str] = None
+) -> tuple[str, List[dict]]:
+    return _ensure_citations_appended(response, citations, expected_text, strip=True), citations
@@ -1,5 +1,7 @@
 import os
+import threading
 import time
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
 from typing import Optional
 
@@ -7,28 +9,48 @@ import redis
 
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_POOL_MAX = int(os.getenv("REDIS_POOL_MAX", "32"))
+REDIS_POOL_TIMEOUT_SEC = float(os.getenv("REDIS_POOL_TIMEOUT_SEC", "2"))
 ANON_CHAT_TTL_SEC = int(os.getenv("ANON_CHAT_TTL_SEC", "7200"))
 ANON_CHAT_TURN_LIMIT = int(os.getenv("ANON_CHAT_TURN_LIMIT", "10"))
 ANON_DAILY_TURN_LIMIT = int(os.getenv("ANON_DAILY_TURN_LIMIT", "10"))
-KST_TZ = timezone(timedelta(hours=9))
+MEM_STORE_MAX = int(os.getenv("MEM_STORE_MAX", "100000"))
+KST_OFFSET_SEC = 9 * 3600
 
 _REDIS_CLIENT = None
 _REDIS_AVAILABLE = True
-_MEM_STORE = {}
-_MEM_DAILY = {}
+_TURN_SCRIPT = None
+_DAILY_SCRIPT = None
+_INIT_SCRIPT = None
+_KST_DAY_KEY = (-1, "")
+_MEM_LOCK = threading.Lock()
+_MEM_STORE: "OrderedDict[str, dict]" = OrderedDict()
+_MEM_DAILY: "OrderedDict[str, dict]" = OrderedDict()
 
 
 def _get_redis():
-    global _REDIS_CLIENT, _REDIS_AVAILABLE
+    global _REDIS_CLIENT, _REDIS_AVAILABLE, _TURN_SCRIPT, _DAILY_SCRIPT, _INIT_SCRIPT
     if not _REDIS_AVAILABLE:
         return None
     if _REDIS_CLIENT is None:
-        client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+        pool = redis.BlockingConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=REDIS_POOL_MAX,
+            timeout=REDIS_POOL_TIMEOUT_SEC,
+            decode_responses=True,
+            socket_keepalive=True,
+            health_check_interval=30,
+        )
+        client = redis.Redis(connection_pool=pool)
         try:
             client.ping()
         except redis.RedisError:
             _REDIS_AVAILABLE = False
             return None
+        # EVALSHA by digest; redis-py reloads the source on NOSCRIPT.
+        _TURN_SCRIPT = client.register_script(_TURN_CHECK_LUA)
+        _DAILY_SCRIPT = client.register_script(_DAILY_LIMIT_LUA)
+        _INIT_SCRIPT = client.register_script(_INIT_META_LUA)
         _REDIS_CLIENT = client
     return _REDIS_CLIENT
 
@@ -45,45 +67,59 @@ def _iso_from_ts(ts: int) -> str:
     return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
 
 
+# Fallback stores used when Redis is unavailable: bounded LRU, entries also
+# expire on read once expires_at_ts has passed.
+def _mem_lookup(store: OrderedDict, key: str) -> Optional[dict]:
+    with _MEM_LOCK:
+        data = store.get(key)
+        if not data:
+            return None
+        expires_ts = int(data.get("expires_at_ts") or 0)
+        if expires_ts and time.time() >= expires_ts:
+            store.pop(key, None)
+            return None
+        store.move_to_end(key)
+        return data
+
+
+def _mem_put(store: OrderedDict, key: str, data: dict) -> None:
+    with _MEM_LOCK:
+        store[key] = data
+        store.move_to_end(key)
+        while len(store) > MEM_STORE_MAX:
+            store.popitem(last=False)
+
+
 def _mem_get(key: str) -> Optional[dict]:
-    data = _MEM_STORE.get(key)
-    if not data:
-        return None
-    expires_ts = int(data.get("expires_at_ts") or 0)
-    if expires_ts and time.time() >= expires_ts:
-        _MEM_STORE.pop(key, None)
-        return None
-    return data
+    return _mem_lookup(_MEM_STORE, key)
 
 
 def _daily_key(scope: str, identifier: str, date_key: str) -> str:
     return f"chat:anon:daily:{scope}:{identifier}:{date_key}"
 
 
-def _kst_date_key(now: Optional[datetime] = None) -> str:
-    now = now or datetime.now(KST_TZ)
-    return now.strftime("%Y%m%d")
+def _kst_day(now_ts: Optional[float] = None) -> tuple[str, int]:
+    global _KST_DAY_KEY
+    local_ts = int(time.time() if now_ts is None else now_ts) + KST_OFFSET_SEC
+    day, seconds = divmod(local_ts, 86400)
+    cached_day, date_key = _KST_DAY_KEY
+    if day != cached_day:
+        date_key = time.strftime("%Y%m%d", time.gmtime(day * 86400))
+        _KST_DAY_KEY = (day, date_key)
+    return date_key, max(86400 - seconds, 60)
 
 
-def _seconds_until_kst_day_end(now: Optional[datetime] = None) -> int:
-    now = now or datetime.now(KST_TZ)
-    next_midnight = datetime.combine(
-        now.date() + timedelta(days=1),
-        datetime.min.time(),
-        tzinfo=KST_TZ,
-    )
-    return max(int((next_midnight - now).total_seconds()), 60)
+def _mem_daily_get(key: str) -> Optional[dict]:
+    return _mem_lookup(_MEM_DAILY, key)
 
 
-def _mem_daily_get(key: str) -> Optional[dict]:
-    data = _MEM_DAILY.get(key)
-    if not data:
-        return None
-    expires_ts = int(data.get("expires_at_ts") or 0)
-    if expires_ts and time.time() >= expires_ts:
-        _MEM_DAILY.pop(key, None)
-        return None
-    return data
+_INIT_META_LUA = """
+redis.call("HSET", KEYS[1], unpack(ARGV, 2))
+if tonumber(ARGV[1]) > 0 then
+  redis.call("EXPIREAT", KEYS[1], ARGV[1])
+end
+return 1
+"""
 
 
 def init_conversation_meta(
@@ -114,13 +150,12 @@ def init_conversation_meta(
     if version_id:
         payload["version_id"] = version_id
     if client is None:
-        _MEM_STORE[key] = dict(payload)
+        _mem_put(_MEM_STORE, key, dict(payload))
     else:
-        pipe = client.pipeline()
-        pipe.hset(key, mapping=payload)
-        if expires_ts:
-            pipe.expireat(key, expires_ts)
-        pipe.execute()
+        args = [expires_ts]
+        for field, value in payload.items():
+            args.extend((field, value))
+        _INIT_SCRIPT(keys=[key], args=args, client=client)
     return {
         "mode": mode,
         "store_messages": store_messages,
@@ -133,7 +168,10 @@ def init_conversation_meta(
 def get_conversation_meta(conversation_id: str) -> Optional[dict]:
     client = _get_redis()
     key = _meta_key(conversation_id)
-    data = _mem_get(key) if client is None else client.hgetall(key)
+    return _parse_meta(_mem_get(key) if client is None else client.hgetall(key))
+
+
+def _parse_meta(data: Optional[dict]) -> Optional[dict]:
     if not data:
         return None
     expires_ts = int(data.get("expires_at_ts") or 0)
@@ -149,23 +187,37 @@ def get_conversation_meta(conversation_id: str) -> Optional[dict]:
     }
 
 
+# KEYS[2] (the anonymous daily counter) is keyed by device/IP, not by
+# conversation, so the two keys cannot share a hash tag. The script needs a
+# single Redis node (standalone or Sentinel, as deployed); on Redis Cluster
+# the daily check would have to run as a separate call.
 _TURN_CHECK_LUA = """
 local key = KEYS[1]
+local daily_count = 0
+if #KEYS > 1 then
+  daily_count = redis.call("INCR", KEYS[2])
+  if daily_count == 1 then
+    redis.call("EXPIRE", KEYS[2], tonumber(ARGV[3]))
+  end
+  if daily_count > tonumber(ARGV[2]) then
+    return {0, "daily_limit", 0, 0, daily_count}
+  end
+end
 if redis.call("EXISTS", key) == 0 then
-  return {0, "not_found"}
+  return {0, "not_found", 0, 0, daily_count}
 end
 local expires_at = tonumber(redis.call("HGET", key, "expires_at_ts") or "0")
 local now = tonumber(ARGV[1])
 if expires_at > 0 and now >= expires_at then
-  return {0, "expired", expires_at}
+  return {0, "expired", expires_at, 0, daily_count}
 end
 local turn_limit = tonumber(redis.call("HGET", key, "turn_limit") or "0")
 local turn_count = tonumber(redis.call("HGET", key, "turn_count") or "0")
 if turn_limit > 0 and turn_count >= turn_limit then
-  return {turn_count, "limit", turn_limit}
+  return {turn_count, "limit", turn_limit, 0, daily_count}
 end
 local new_count = redis.call("HINCRBY", key, "turn_count", 1)
-return {new_count, "ok", turn_limit, expires_at}
+return {new_count, "ok", turn_limit, expires_at, daily_count}
 """
 
 _DAILY_LIMIT_LUA = """
@@ -183,40 +235,37 @@ return {new_count, "ok"}
 """
 
 
-def enforce_turn_and_increment(conversation_id: str) -> dict:
-    client = _get_redis()
-    key = _meta_key(conversation_id)
-    now_ts = int(time.time())
-    if client is None:
-        data = _mem_get(key)
-        if not data:
-            return {"status": "not_found"}
-        expires_ts = int(data.get("expires_at_ts") or 0)
-        if expires_ts and now_ts >= expires_ts:
+def _mem_enforce_turn(key: str, now_ts: int) -> dict:
+    data = _mem_get(key)
+    if not data:
+        return {"status": "not_found"}
+    expires_ts = int(data.get("expires_at_ts") or 0)
+    if expires_ts and now_ts >= expires_ts:
+        with _MEM_LOCK:
             _MEM_STORE.pop(key, None)
-            return {
-                "status": "expired",
-                "expires_at": _iso_from_ts(expires_ts),
-            }
-        turn_limit = int(data.get("turn_limit") or 0)
-        turn_count = int(data.get("turn_count") or 0)
-        if turn_limit > 0 and turn_count >= turn_limit:
-            return {
-                "status": "limit",
-                "turn_count": turn_count,
-                "turn_limit": turn_limit,
-            }
-        turn_count += 1
-        data["turn_count"] = str(turn_count)
         return {
-            "status": "ok",
+            "status": "expired",
+            "expires_at": _iso_from_ts(expires_ts),
+        }
+    turn_limit = int(data.get("turn_limit") or 0)
+    turn_count = int(data.get("turn_count") or 0)
+    if turn_limit > 0 and turn_count >= turn_limit:
+        return {
+            "status": "limit",
             "turn_count": turn_count,
             "turn_limit": turn_limit,
-            "expires_at": _iso_from_ts(expires_ts) if expires_ts else None,
         }
-    result = client.eval(_TURN_CHECK_LUA, 1, key, now_ts)
-    if not result:
-        return {"status": "not_found"}
+    turn_count += 1
+    data["turn_count"] = str(turn_count)
+    return {
+        "status": "ok",
+        "turn_count": turn_count,
+        "turn_limit": turn_limit,
+        "expires_at": _iso_from_ts(expires_ts) if expires_ts else None,
+    }
+
+
+def _turn_result(result) -> dict:
     status = result[1]
     if status == "ok":
         return {
@@ -236,9 +285,54 @@ def enforce_turn_and_increment(conversation_id: str) -> dict:
             "turn_count": int(result[0]),
             "turn_limit": int(result[2] or 0),
         }
+    if status == "daily_limit":
+        return {"status": "daily_limit"}
     return {"status": "not_found"}
 
 
+# With daily_identifier set, the anonymous daily counter is checked in the same
+# script call and reported under "daily"; status "daily_limit" means the turn
+# was not counted.
+def enforce_turn_and_increment(
+    conversation_id: str,
+    daily_identifier: Optional[str] = None,
+    daily_limit: int | None = None,
+    daily_scope: str = "device",
+) -> dict:
+    client = _get_redis()
+    key = _meta_key(conversation_id)
+    now_ts = int(time.time())
+    if client is None:
+        daily = None
+        if daily_identifier:
+            daily = enforce_anonymous_daily_limit(daily_identifier, daily_limit, scope=daily_scope)
+            if daily.get("status") == "limit":
+                return {"status": "daily_limit", "daily": daily}
+        info = _mem_enforce_turn(key, now_ts)
+    else:
+        keys = [key]
+        args = [now_ts]
+        if daily_identifier:
+            daily_limit = int(daily_limit or ANON_DAILY_TURN_LIMIT)
+            date_key, ttl = _kst_day(now_ts)
+            keys.append(_daily_key(daily_scope, daily_identifier, date_key))
+            args.extend((daily_limit, ttl))
+        result = _TURN_SCRIPT(keys=keys, args=args, client=client)
+        if not result:
+            return {"status": "not_found"}
+        info = _turn_result(result)
+        daily = None
+        if daily_identifier:
+            daily = {
+                "status": "limit" if info["status"] == "daily_limit" else "ok",
+                "count": int(result[4]),
+                "limit": daily_limit,
+            }
+    if daily is not None:
+        info["daily"] = daily
+    return info
+
+
 def build_anonymous_meta_ttl() -> tuple[datetime, int]:
     ttl_sec = max(60, ANON_CHAT_TTL_SEC)
     return datetime.now(timezone.utc) + timedelta(seconds=ttl_sec), ttl_sec
@@ -252,21 +346,19 @@ def enforce_anonymous_daily_limit(
     if not identifier:
         return {"status": "ok"}
     limit = int(limit or ANON_DAILY_TURN_LIMIT)
-    now = datetime.now(KST_TZ)
-    date_key = _kst_date_key(now)
-    ttl = _seconds_until_kst_day_end(now)
+    date_key, ttl = _kst_day()
     key = _daily_key(scope, identifier, date_key)
     client = _get_redis()
     if client is None:
         data = _mem_daily_get(key)
         if not data:
             data = {"count": 0, "expires_at_ts": int(time.time()) + ttl}
-            _MEM_DAILY[key] = data
+            _mem_put(_MEM_DAILY, key, data)
         data["count"] = int(data.get("count") or 0) + 1
         if data["count"] > limit:
             return {"status": "limit", "count": data["count"], "limit": limit}
         return {"status": "ok", "count": data["count"], "limit": limit}
-    result = client.eval(_DAILY_LIMIT_LUA, 1, key, limit, ttl)
+    result = _DAILY_SCRIPT(keys=[key], args=[limit, ttl], client=client)
     if not result:
         return {"status": "ok"}
     status = result[1]
@@ -284,8 +376,7 @@ def get_anonymous_daily_usage(
         limit = int(limit or ANON_DAILY_TURN_LIMIT)
         return {"count": 0, "limit": limit, "remaining": limit}
     limit = int(limit or ANON_DAILY_TURN_LIMIT)
-    now = datetime.now(KST_TZ)
-    date_key = _kst_date_key(now)
+    date_key, _ttl = _kst_day()
     key = _daily_key(scope, identifier, date_key)
     client = _get_redis()
     if client is None:
@@ -297,3 +388,28 @@ def get_anonymous_daily_usage(
     count = int(raw or 0)
     remaining = max(limit - count, 0)
     return {"count": count, "limit": limit, "remaining": remaining}
+
+
+def get_meta_and_daily_usage(
+    conversation_id: str,
+    identifier: str,
+    limit: int | None = None,
+    scope: str = "device",
+) -> tuple[Optional[dict], Optional[dict]]:
+    client = _get_redis()
+    if client is None or not identifier:
+        meta = get_conversation_meta(conversation_id)
+        if not meta or meta.get("mode") != "anonymous":
+            return meta, None
+        return meta, get_anonymous_daily_usage(identifier, limit, scope=scope)
+    limit = int(limit or ANON_DAILY_TURN_LIMIT)
+    daily_key = _daily_key(scope, identifier, _kst_day()[0])
+    pipe = client.pipeline(transaction=False)
+    pipe.hgetall(_meta_key(conversation_id))
+    pipe.get(daily_key)
+    data, raw = pipe.execute()
+    meta = _parse_meta(data)
+    if not meta or meta.get("mode") != "anonymous":
+        return meta, None
+    count = int(raw or 0)
+    return meta, {"count": count, "limit": limit, "remaining": max(limit - count, 0)}
@@ -6,6 +6,12 @@ DB = {
     "dbname": os.getenv("BIBLE_DB_NAME", "bible_app"),
     "user": os.getenv("BIBLE_DB_USER", "bible"),
     "password": os.getenv("BIBLE_DB_PASSWORD", "biblepassword"),
+    # Pooled connections sit idle between requests; keepalives let the server
+    # and any NAT in between see them as alive and detect dead peers.
+    "keepalives": 1,
+    "keepalives_idle": int(os.getenv("BIBLE_DB_KEEPALIVES_IDLE", "30")),
+    "keepalives_interval": int(os.getenv("BIBLE_DB_KEEPALIVES_INTERVAL", "10")),
+    "keepalives_count": int(os.getenv("BIBLE_DB_KEEPALIVES_COUNT", "3")),
 }
 
 API_TITLE = "TheBibleAI API"
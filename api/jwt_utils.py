@@ -1,5 +1,7 @@
+import base64
 import hashlib
 import hmac
+import json
 import os
 import time
 import uuid
@@ -14,12 +16,34 @@ JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "thebibleai")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_ACCESS_TTL_SEC = int(os.getenv("JWT_ACCESS_TTL_SEC", "3600"))
 JWT_REFRESH_TTL_SEC = int(os.getenv("JWT_REFRESH_TTL_SEC", "2592000"))
+JWT_FAST = os.getenv("JWT_FAST", "1") == "1"
+
+# HS256 tokens are minted directly: the header segment and the keyed HMAC
+# state are built once, and each token only hashes its own payload. Output is
+# identical to jwt.encode; decoding still goes through PyJWT.
+_JWT_SECRET_HMAC = hmac.new(JWT_SECRET.encode("utf-8"), digestmod=hashlib.sha256)
+_JWT_HS256_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+_JWT_HS256_PREFIX = _JWT_HS256_HEADER.decode("ascii") + "."
 
 
 def _now_ts() -> int:
     return int(time.time())
 
 
+def _b64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _encode_token(payload: dict) -> str:
+    if JWT_ALGORITHM != "HS256":
+        return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    signing_input = _JWT_HS256_HEADER + b"." + _b64url(body)
+    mac = _JWT_SECRET_HMAC.copy()
+    mac.update(signing_input)
+    return (signing_input + b"." + _b64url(mac.digest())).decode("ascii")
+
+
 def create_access_token(user_id: str, email: str | None = None) -> tuple[str, int]:
     now = _now_ts()
     exp = now + JWT_ACCESS_TTL_SEC
@@ -32,7 +56,7 @@ def create_access_token(user_id: str, email: str | None = None) -> tuple[str, in
         "iss": JWT_ISSUER,
         "aud": JWT_AUDIENCE,
     }
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    token = _encode_token(payload)
     return token, exp
 
 
@@ -50,11 +74,62 @@ def create_refresh_token(user_id: str, email: str | None = None) -> tuple[str, s
         "iss": JWT_ISSUER,
         "aud": JWT_AUDIENCE,
     }
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    token = _encode_token(payload)
     return token, refresh_id, exp
 
 
+# Verifies tokens carrying exactly the header _encode_token emits, with the
+# claim checks jwt.decode applies for our issuer/audience, except that iat/nbf/exp
+# must be JSON numbers (RFC 7519 NumericDate). Anything else (other headers or
+# algorithms) goes through PyJWT.
+def _decode_hs256(token: str) -> dict | None:
+    signing_input, _, signature = token.rpartition(".")
+    body = signing_input[len(_JWT_HS256_PREFIX):]
+    if not body or "." in body:
+        return None
+    try:
+        mac = _JWT_SECRET_HMAC.copy()
+        mac.update(signing_input.encode("ascii"))
+        if not hmac.compare_digest(_b64url(mac.digest()), signature.encode("ascii")):
+            return None
+        payload = json.loads(base64.urlsafe_b64decode(body + "=" * (-len(body) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    for claim in ("iat", "nbf", "exp"):
+        value = payload.get(claim)
+        if claim in payload and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            return None
+    now = time.time()
+    try:
+        if "iat" in payload and int(payload["iat"]) > now:
+            return None
+        if "nbf" in payload and int(payload["nbf"]) > now:
+            return None
+        if "exp" in payload and int(payload["exp"]) <= now:
+            return None
+    except (ValueError, OverflowError):
+        return None
+    if payload.get("iss") != JWT_ISSUER:
+        return None
+    audience = payload.get("aud")
+    if isinstance(audience, str):
+        audience = [audience]
+    if not isinstance(audience, list) or any(not isinstance(aud, str) for aud in audience):
+        return None
+    if JWT_AUDIENCE not in audience:
+        return None
+    if "sub" in payload and not isinstance(payload["sub"], str):
+        return None
+    if "jti" in payload and not isinstance(payload["jti"], str):
+        return None
+    return payload
+
+
 def _decode_token(token: str) -> dict | None:
+    if JWT_FAST and JWT_ALGORITHM == "HS256" and token.startswith(_JWT_HS256_PREFIX):
+        return _decode_hs256(token)
     try:
         return jwt.decode(
             token,
@@ -82,9 +157,9 @@ def verify_refresh_token(token: str) -> dict | None:
 
 
 def hash_refresh_id(refresh_id: str) -> str:
-    secret = JWT_SECRET.encode("utf-8")
-    raw = refresh_id.encode("utf-8")
-    return hmac.new(secret, raw, hashlib.sha256).hexdigest()
+    mac = _JWT_SECRET_HMAC.copy()
+    mac.update(refresh_id.encode("utf-8"))
+    return mac.hexdigest()
 
 
 def exp_to_datetime(exp_ts: int) -> datetime:
@@ -1,12 +1,16 @@
 import os
 import time
 import secrets
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Optional
 
 import psycopg2
 import requests
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
@@ -64,12 +68,14 @@ from api.auth import (
     record_login_failure,
     requires_captcha,
     revoke_session,
+    flush_session_touches,
     touch_session,
     update_password_hash,
     update_last_login,
     validate_email,
+    warm_dummy_password_hash,
     verify_captcha_token,
-    verify_password,
+    verify_password_or_dummy,
 )
 from api.jwt_utils import (
     create_access_token,
@@ -94,8 +100,10 @@ from api.refresh_tokens import (
 from api.chat import (
     append_citations_to_response,
     build_assistant_message,
+    cache_stats,
     CRISIS_RESPONSE,
     enforce_exact_citations,
+    format_citations,
     gate_need_verse,
     log_api_event,
     log_chat_event,
@@ -117,12 +125,13 @@ from api.chat_meta import (
     ANON_DAILY_TURN_LIMIT,
     ANON_CHAT_TURN_LIMIT,
     build_anonymous_meta_ttl,
-    enforce_anonymous_daily_limit,
     get_anonymous_daily_usage,
     enforce_turn_and_increment,
     get_conversation_meta,
+    get_meta_and_daily_usage,
     init_conversation_meta,
 )
+from api.prepared import execute_prepared
 from api.ref_parser import extract_reference, parse_reference
 from api.search import search_verses
 from api.user_settings import ensure_user_settings, get_user_settings, update_user_settings
@@ -150,6 +159,19 @@ app.add_middleware(
 
 EVENT_LOG_RESET_ON_STARTUP = os.getenv("EVENT_LOG_RESET_ON_STARTUP", "1") == "1"
 ALLOW_LOG_RESET = os.getenv("ALLOW_LOG_RESET", "1") == "1"
+ALLOW_CACHE_STATS = os.getenv("ALLOW_CACHE_STATS", "1") == "1"
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "2"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "20"))
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "1") == "1"
+SPECULATIVE_RETRIEVAL_WORKERS = int(os.getenv("SPECULATIVE_RETRIEVAL_WORKERS", "4"))
+SPECULATIVE_RETRIEVAL_TIMEOUT_SEC = float(os.getenv("SPECULATIVE_RETRIEVAL_TIMEOUT_SEC", "5"))
+
+_PG_POOL = None
+_PG_POOL_LOCK = threading.Lock()
+RETRIEVAL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=max(1, SPECULATIVE_RETRIEVAL_WORKERS), thread_name_prefix="retrieval"
+)
+RETRIEVAL_SLOTS = threading.BoundedSemaphore(max(1, SPECULATIVE_RETRIEVAL_WORKERS))
 
 
 @app.on_event("startup")
@@ -158,6 +180,29 @@ def _reset_event_log_on_startup() -> None:
         reset_event_log("startup")
 
 
+@app.on_event("startup")
+def _warm_dummy_password_hash() -> None:
+    # Unknown-email logins verify against this hash; build it before the first one.
+    warm_dummy_password_hash()
+
+
+@app.on_event("shutdown")
+def _close_pg_pool() -> None:
+    global _PG_POOL
+    with _PG_POOL_LOCK:
+        if _PG_POOL is not None:
+            try:
+                conn = _PG_POOL.getconn()
+                try:
+                    flush_session_touches(conn)
+                finally:
+                    _PG_POOL.putconn(conn)
+            except (PoolError, psycopg2.Error):
+                pass
+            _PG_POOL.closeall()
+            _PG_POOL = None
+
+
 @app.exception_handler(HTTPException)
 def handle_http_exception(_request: Request, exc: HTTPException):
     return JSONResponse(
@@ -190,12 +235,62 @@ def reset_logs(request: Request):
     return {"reset": True}
 
 
+@app.get("/v1/debug/caches")
+def get_cache_stats():
+    if not ALLOW_CACHE_STATS:
+        raise HTTPException(status_code=403, detail="cache stats disabled")
+    return cache_stats()
+
+
+def _get_pg_pool() -> ThreadedConnectionPool:
+    global _PG_POOL
+    if _PG_POOL is None:
+        with _PG_POOL_LOCK:
+            if _PG_POOL is None:
+                _PG_POOL = ThreadedConnectionPool(PG_POOL_MIN, PG_POOL_MAX, **DB)
+    return _PG_POOL
+
+
 def get_conn():
-    conn = psycopg2.connect(**DB)
+    pool = _get_pg_pool()
+    try:
+        conn = pool.getconn()
+    except PoolError:
+        # Pool exhausted: serve the request with a one-off connection.
+        pool = None
+        conn = psycopg2.connect(**DB)
     try:
         yield conn
     finally:
-        conn.close()
+        if pool is None:
+            conn.close()
+        else:
+            _release_conn(pool, conn)
+
+
+def _release_conn(pool: ThreadedConnectionPool, conn) -> None:
+    broken = bool(conn.closed)
+    if not broken and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            broken = True
+    pool.putconn(conn, close=broken)
+
+
+def _retrieve_citations_detached(version_id: str, user_message: str, **kwargs) -> Optional[tuple]:
+    # Speculation only borrows an idle pooled connection; when the pool is
+    # exhausted the request retrieves on its own connection instead.
+    pool = _get_pg_pool()
+    try:
+        conn = pool.getconn()
+    except PoolError:
+        return None
+    try:
+        citations, retrieval_meta = retrieve_citations(conn, version_id, user_message, **kwargs)
+        return _verify_citations(conn, citations), retrieval_meta
+    finally:
+        _release_conn(pool, conn)
 
 
 def _get_bearer_token(request: Request) -> str | None:
@@ -294,10 +389,10 @@ def require_user(request: Request, conn=Depends(get_conn)) -> dict:
     session = get_session(conn, token)
     if not session:
         raise HTTPException(status_code=401, detail="invalid session")
-    expires_at = session.get("expires_at")
+    expires_at = session.expires_at
     if expires_at and expires_at < datetime.now(timezone.utc):
         raise HTTPException(status_code=401, detail="session expired")
-    user = get_user_by_id(conn, session["user_id"])
+    user = get_user_by_id(conn, session.user_id)
     if not user:
         raise HTTPException(status_code=401, detail="user not found")
     touch_session(conn, token)
@@ -315,10 +410,10 @@ def get_optional_user(request: Request, conn=Depends(get_conn)) -> dict | None:
     session = get_session(conn, token)
     if not session:
         raise HTTPException(status_code=401, detail="invalid session")
-    expires_at = session.get("expires_at")
+    expires_at = session.expires_at
     if expires_at and expires_at < datetime.now(timezone.utc):
         raise HTTPException(status_code=401, detail="session expired")
-    user = get_user_by_id(conn, session["user_id"])
+    user = get_user_by_id(conn, session.user_id)
     if not user:
         raise HTTPException(status_code=401, detail="user not found")
     touch_session(conn, token)
@@ -430,7 +525,9 @@ def _verify_citations(conn, citations: list[dict]) -> list[dict]:
     verified = []
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
         for c in citations:
-            cur.execute(
+            execute_prepared(
+                cur,
+                "verify_citation",
                 """
                 SELECT text
                 FROM bible_verse
@@ -639,11 +736,13 @@ def login(payload: AuthLoginRequest, request: Request, conn=Depends(get_conn)):
             raise HTTPException(status_code=403, detail="captcha required")
 
     user = get_user_by_email(conn, email)
-    if not user or not verify_password(payload.password or "", user["password_hash"]):
+    stored_hash = user["password_hash"] if user else None
+    pbkdf2_parts = user.get("_pbkdf2_parts") if user else None
+    if not verify_password_or_dummy(payload.password or "", stored_hash, pbkdf2_parts):
         if email:
-            record_login_failure(conn, "account", email, now)
+            record_login_failure(conn, "account", email)
         if ip_address:
-            record_login_failure(conn, "ip", ip_address, now)
+            record_login_failure(conn, "ip", ip_address)
         conn.commit()
         log_api_event("auth_login_failed", {"reason": "invalid_credentials"})
         raise HTTPException(status_code=401, detail="invalid credentials")
@@ -1251,16 +1350,14 @@ def get_conversation(conversation_id: str, request: Request, conn=Depends(get_co
     record = store.get(conversation_id, conn=conn)
     if not record:
         raise HTTPException(status_code=404, detail="conversation not found")
-    meta = get_conversation_meta(conversation_id)
-    daily_info = None
-    if meta and meta.get("mode") == "anonymous":
-        device_id = (record.get("device_id") or "").strip()
-        if device_id in {"web", "mobile"}:
-            device_id = ""
-        client_ip = _get_client_ip(request)
-        identifier = device_id or client_ip
-        scope = "device" if device_id else "ip"
-        daily_info = get_anonymous_daily_usage(identifier, ANON_DAILY_TURN_LIMIT, scope=scope)
+    device_id = (record.get("device_id") or "").strip()
+    if device_id in {"web", "mobile"}:
+        device_id = ""
+    identifier = device_id or _get_client_ip(request)
+    scope = "device" if device_id else "ip"
+    meta, daily_info = get_meta_and_daily_usage(
+        conversation_id, identifier, ANON_DAILY_TURN_LIMIT, scope=scope
+    )
     meta_payload = _meta_payload(meta)
     meta_payload.update(_daily_payload(daily_info))
     log_api_event("chat_get", {"conversation_id": conversation_id})
@@ -1353,18 +1450,20 @@ def post_message(
         client_ip = _get_client_ip(request) if request else ""
         identifier = device_id or client_ip
         scope = "device" if device_id else "ip"
-        daily_status = enforce_anonymous_daily_limit(
-            identifier, ANON_DAILY_TURN_LIMIT, scope=scope
-        )
-        if daily_status.get("status") == "limit":
-            raise HTTPException(status_code=429, detail="daily trial limit reached")
-        daily_info = daily_status
+        daily_info = {"status": "ok"}
     else:
+        identifier = None
+        scope = "device"
         daily_info = None
     try:
-        turn_info = enforce_turn_and_increment(conversation_id)
+        turn_info = enforce_turn_and_increment(
+            conversation_id, identifier, ANON_DAILY_TURN_LIMIT, daily_scope=scope
+        )
     except Exception:
         raise HTTPException(status_code=503, detail="chat store unavailable")
+    daily_info = turn_info.get("daily", daily_info)
+    if turn_info.get("status") == "daily_limit":
+        raise HTTPException(status_code=429, detail="daily trial limit reached")
     if turn_info.get("status") == "not_found":
         raise HTTPException(status_code=404, detail="conversation not found")
     if turn_info.get("status") == "expired":
@@ -1381,7 +1480,7 @@ def post_message(
 
     sanitized_message = _mask_pii(payload.user_message)
     citation_version_id = select_citation_version_id(record.get("locale"), sanitized_message)
-    store.add_message(conversation_id, "user", sanitized_message, conn=conn)
+    store.add_message(conversation_id, "user", sanitized_message, conn=conn, defer=True)
     log_chat_event(
         "chat_message",
         {
@@ -1391,6 +1490,27 @@ def post_message(
         },
     )
 
+    # The user row is written together with the assistant reply in one commit;
+    # if the turn fails before that, it is still written here.
+    try:
+        return _reply_to_message(
+            conversation_id, record, meta_payload, sanitized_message, citation_version_id, conn
+        )
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        store.flush_messages(conversation_id, conn)
+
+
+def _reply_to_message(
+    conversation_id: str,
+    record: dict,
+    meta_payload: dict,
+    sanitized_message: str,
+    citation_version_id: str,
+    conn,
+) -> dict:
     direct_ref = extract_reference(sanitized_message)
     if direct_ref:
         book_name, ch, vs_start, vs_end = direct_ref
@@ -1436,8 +1556,9 @@ def post_message(
                     }
                 )
         citations = _verify_citations(conn, citations)
-        assistant_message = append_citations_to_response("", citations)
-        assistant_message, citations = enforce_exact_citations(assistant_message, citations)
+        citation_text = format_citations(citations)
+        assistant_message = append_citations_to_response("", citations, citation_text)
+        assistant_message, citations = enforce_exact_citations(assistant_message, citations, citation_text)
         turn_index = len(record["messages"])
         log_chat_event(
             "citation_attempt",
@@ -1560,12 +1681,36 @@ def post_message(
         summary = record.get("summary", "")
 
     recent_messages = record["messages"][-RECENT_TURNS:]
+    speculative: Optional[Future] = None
+
+    def _speculate_retrieval() -> None:
+        # Rules could not decide, so the gate waits on the LLM; run retrieval
+        # on its own pooled connection meanwhile and drop it if the gate says no.
+        nonlocal speculative
+        if not SPECULATIVE_RETRIEVAL or not RETRIEVAL_SLOTS.acquire(blocking=False):
+            return
+        try:
+            speculative = RETRIEVAL_EXECUTOR.submit(
+                _retrieve_citations_detached,
+                citation_version_id,
+                sanitized_message,
+                summary=summary,
+                recent_messages=recent_messages,
+                use_openai=use_openai_llm,
+                openai_api_key=openai_api_key,
+            )
+        except RuntimeError:
+            RETRIEVAL_SLOTS.release()
+            return
+        speculative.add_done_callback(lambda _done: RETRIEVAL_SLOTS.release())
+
     gating = gate_need_verse(
         sanitized_message,
         summary,
         recent_messages,
         use_openai=use_openai_llm,
         openai_api_key=openai_api_key,
+        on_llm_gate=_speculate_retrieval,
     )
     citations = []
     retrieval_meta: dict = {}
@@ -1584,16 +1729,26 @@ def post_message(
                 "user_goal": gating.get("user_goal", ""),
             },
         )
-        citations, retrieval_meta = retrieve_citations(
-            conn,
-            citation_version_id,
-            sanitized_message,
-            summary=summary,
-            recent_messages=recent_messages,
-            use_openai=use_openai_llm,
-            openai_api_key=openai_api_key,
-        )
-        citations = _verify_citations(conn, citations)
+        retrieved = None
+        if speculative is not None:
+            try:
+                retrieved = speculative.result(timeout=SPECULATIVE_RETRIEVAL_TIMEOUT_SEC)
+            except Exception:
+                speculative.cancel()
+                retrieved = None
+        if retrieved is None:
+            citations, retrieval_meta = retrieve_citations(
+                conn,
+                citation_version_id,
+                sanitized_message,
+                summary=summary,
+                recent_messages=recent_messages,
+                use_openai=use_openai_llm,
+                openai_api_key=openai_api_key,
+            )
+            citations = _verify_citations(conn, citations)
+        else:
+            citations, retrieval_meta = retrieved
         log_chat_event(
             "retrieval_candidates",
             {
@@ -1602,6 +1757,11 @@ def post_message(
                 **retrieval_meta,
             },
         )
+    elif speculative is not None:
+        log_chat_event(
+            "retrieval_speculative_discarded",
+            {"conversation_id": conversation_id, "started": not speculative.cancel()},
+        )
 
     llm_meta: dict = {}
     assistant_message, llm_ok = build_assistant_message(
@@ -1618,8 +1778,9 @@ def post_message(
     if not llm_ok:
         gating["need_verse"] = False
         gating["source"] = "degraded"
+    citation_text = format_citations(citations) if citations else None
     if gating.get("need_verse"):
-        assistant_message = append_citations_to_response(assistant_message, citations)
+        assistant_message = append_citations_to_response(assistant_message, citations, citation_text)
     if gating.get("need_verse"):
         if citations:
             log_chat_event(
@@ -1647,7 +1808,7 @@ def post_message(
                     "reason": retrieval_meta.get("failure_reason") or "verification_failed",
                 },
             )
-    assistant_message, citations = enforce_exact_citations(assistant_message, citations)
+    assistant_message, citations = enforce_exact_citations(assistant_message, citations, citation_text)
     store.add_message(conversation_id, "assistant", assistant_message, conn=conn)
     log_chat_event(
         "chat_response",
@@ -0,0 +1,28 @@
+import threading
+import weakref
+
+# Pooled connections live for the whole process, so the hot fixed-shape
+# statements are PREPAREd once per connection and EXECUTEd afterwards.
+# Call sites write the usual %s placeholders; they are numbered for PREPARE.
+_PREPARED_STATEMENTS = weakref.WeakKeyDictionary()
+_PREPARED_LOCK = threading.Lock()
+
+
+def _numbered_params(sql: str) -> str:
+    parts = sql.split("%s")
+    return "".join(
+        part + (f"${idx}" if idx < len(parts) else "")
+        for idx, part in enumerate(parts, start=1)
+    )
+
+
+def execute_prepared(cur, name: str, sql: str, params: tuple) -> None:
+    with _PREPARED_LOCK:
+        prepared = _PREPARED_STATEMENTS.setdefault(cur.connection, set())
+    if name not in prepared:
+        cur.execute(f"PREPARE {name} AS {_numbered_params(sql)}")
+        prepared.add(name)
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f"EXECUTE {name}")
@@ -1,8 +1,10 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from psycopg2.extras import RealDictCursor
 from etl.utils import normalize_text
 
 
+# Must stay >= pg_trgm.similarity_threshold (default 0.3): the `%` guard in the
+# WHERE clauses lets the trigram GIN index prefilter, similarity() is exact.
 TRGM_SIMILARITY_THRESHOLD = 0.3
 
 
@@ -28,10 +30,18 @@ def search_verses(conn, version_id: str, query: str, limit: int, offset: int) ->
               AND (
                 (%s AND v.search_vector @@ plainto_tsquery('simple', %s))
                 OR v.normalized ILIKE %s
-                OR similarity(v.normalized, %s) > %s
+                OR (v.normalized %% %s AND similarity(v.normalized, %s) > %s)
               )
             """,
-            (version_id, use_tsquery, ts_query, like_pattern, normalized_query, TRGM_SIMILARITY_THRESHOLD),
+            (
+                version_id,
+                use_tsquery,
+                ts_query,
+                like_pattern,
+                normalized_query,
+                normalized_query,
+                TRGM_SIMILARITY_THRESHOLD,
+            ),
         )
         total = cur.fetchone()["total"]
 
@@ -60,7 +70,7 @@ def search_verses(conn, version_id: str, query: str, limit: int, offset: int) ->
               AND (
                 (%s AND v.search_vector @@ plainto_tsquery('simple', %s))
                 OR v.normalized ILIKE %s
-                OR similarity(v.normalized, %s) > %s
+                OR (v.normalized %% %s AND similarity(v.normalized, %s) > %s)
               )
             ORDER BY exact_rank DESC, fallback_rank ASC, rank DESC, trgm_sim DESC, v.book_id, v.chapter, v.verse
             LIMIT %s OFFSET %s
@@ -76,6 +86,7 @@ def search_verses(conn, version_id: str, query: str, limit: int, offset: int) ->
                 ts_query,
                 like_pattern,
                 normalized_query,
+                normalized_query,
                 TRGM_SIMILARITY_THRESHOLD,
                 limit,
                 offset,
@@ -120,6 +131,7 @@ def search_verses_vector(
                     v.chapter,
                     v.verse,
                     v.text,
+                    v.normalized AS text_norm,
                     w.distance
                 FROM (
                     SELECT
@@ -165,8 +177,108 @@ def search_verses_vector(
             "chapter": row["chapter"],
             "verse": row["verse"],
             "text": row["text"],
+            "text_norm": row["text_norm"],
             "vector_distance": row["distance"],
             "source": "vector",
         }
         for row in rows
     ]
+
+
+def search_verses_first_hit(
+    conn, version_id: str, queries: List[str], limit: int
+) -> Tuple[int, List[dict]]:
+    # Runs the retry chain (primary, synonym, raw message...) in one round trip.
+    # Each branch only executes when every earlier branch came back empty.
+    branches = [normalize_text(query or "") for query in queries]
+    if not any(branches):
+        return -1, []
+
+    ctes = []
+    params: list = []
+    selects = []
+    for idx, normalized_query in enumerate(branches):
+        if not normalized_query:
+            continue
+        guard = "".join(
+            f"\n                AND NOT EXISTS (SELECT 1 FROM b{prev})"
+            for prev in range(idx)
+            if branches[prev]
+        )
+        ctes.append(
+            f"""
+            b{idx} AS (
+              SELECT
+                {idx} AS branch,
+                row_number() OVER (
+                  ORDER BY
+                    CASE WHEN v.text ILIKE %s THEN 1 ELSE 0 END DESC,
+                    CASE WHEN v.search_vector @@ plainto_tsquery('simple', %s) THEN 0 ELSE 1 END ASC,
+                    ts_rank_cd(v.search_vector, plainto_tsquery('simple', %s)) DESC,
+                    similarity(v.normalized, %s) DESC,
+                    v.book_id, v.chapter, v.verse
+                ) AS pos,
+                v.book_id,
+                b.ko_name AS book_name,
+                v.chapter,
+                v.verse,
+                v.text,
+                v.normalized AS text_norm,
+                ts_rank_cd(v.search_vector, plainto_tsquery('simple', %s)) AS rank,
+                similarity(v.normalized, %s) AS trgm_sim
+              FROM bible_verse v
+              JOIN bible_book b
+                ON b.version_id = v.version_id AND b.book_id = v.book_id
+              WHERE v.version_id = %s
+                AND (
+                  (%s AND v.search_vector @@ plainto_tsquery('simple', %s))
+                  OR v.normalized ILIKE %s
+                  OR (v.normalized %% %s AND similarity(v.normalized, %s) > %s)
+                ){guard}
+              ORDER BY pos
+              LIMIT %s
+            )"""
+        )
+        like_pattern = f"%{normalized_query}%"
+        params.extend(
+            [
+                like_pattern,
+                normalized_query,
+                normalized_query,
+                normalized_query,
+                normalized_query,
+                normalized_query,
+                version_id,
+                len(normalized_query) >= 2,
+                normalized_query,
+                like_pattern,
+                normalized_query,
+                normalized_query,
+                TRGM_SIMILARITY_THRESHOLD,
+                limit,
+            ]
+        )
+        selects.append(f"SELECT * FROM b{idx}")
+
+    sql = "WITH" + ",".join(ctes) + "\n" + "\nUNION ALL\n".join(selects) + "\nORDER BY branch, pos"
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+    if not rows:
+        return -1, []
+    branch = rows[0]["branch"]
+    items = [
+        {
+            "book_id": row["book_id"],
+            "book_name": row["book_name"],
+            "chapter": row["chapter"],
+            "verse": row["verse"],
+            "text": row["text"],
+            "text_norm": row["text_norm"],
+            "rank": row["rank"],
+            "trgm_sim": row["trgm_sim"],
+        }
+        for row in rows
+        if row["branch"] == branch
+    ]
+    return branch, items
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+
+import numpy as np
+
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "2048"))
+SEMANTIC_CACHE_TTL_SEC = int(os.getenv("SEMANTIC_CACHE_TTL_SEC", "3600"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_INT8 = os.getenv("SEMANTIC_CACHE_INT8", "1") == "1"
+
+
+# LRU + TTL cache looked up by cosine similarity. Vectors are kept unit-normalized
+# in one preallocated matrix, so a lookup is one matrix-vector product. With
+# quantize=True rows are stored as int8 with a per-row scale (4x less memory);
+# dot products accumulate in int32, cosine error stays around 1e-3.
+class SemanticCache:
+    def __init__(self, capacity: int, ttl_sec: int, threshold: float, quantize: bool = False):
+        self.capacity = capacity
+        self.ttl_sec = ttl_sec
+        self.threshold = threshold
+        self.quantize = quantize
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[int, object]" = OrderedDict()
+        self._namespaces: dict = {}
+        self._matrix = None
+        self._scales = None
+        self._slot_ns = None
+        self._slot_expires = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _unit(self, vector: List[float]):
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        if not norm:
+            return None
+        return vec / norm
+
+    def _quantized(self, unit):
+        scale = float(np.abs(unit).max()) / 127.0
+        return np.rint(unit / scale).astype(np.int8), scale
+
+    def _similarities(self, used: int, query):
+        if not self.quantize:
+            return self._matrix[:used] @ query
+        qvec, qscale = self._quantized(query)
+        dots = np.einsum("ij,j->i", self._matrix[:used], qvec, dtype=np.int32)
+        return dots.astype(np.float32) * self._scales[:used] * np.float32(qscale)
+
+    def get(self, namespace: Hashable, vector: List[float]) -> Optional[object]:
+        if not self.enabled or not vector:
+            return None
+        query = self._unit(vector)
+        if query is None:
+            return None
+        with self._lock:
+            ns_id = self._namespaces.get(namespace)
+            if ns_id is None or self._matrix is None or query.shape[0] != self._matrix.shape[1]:
+                return None
+            used = len(self._lru)
+            sims = self._similarities(used, query)
+            stale = (self._slot_ns[:used] != ns_id) | (self._slot_expires[:used] < time.monotonic())
+            sims[stale] = -1.0
+            slot = int(np.argmax(sims))
+            if sims[slot] < self.threshold:
+                return None
+            self._lru.move_to_end(slot)
+            return self._lru[slot]
+
+    def put(self, namespace: Hashable, vector: List[float], value: object) -> None:
+        if not self.enabled or not vector:
+            return
+        unit = self._unit(vector)
+        if unit is None:
+            return
+        with self._lock:
+            if self._matrix is None:
+                dtype = np.int8 if self.quantize else np.float32
+                self._matrix = np.zeros((self.capacity, unit.shape[0]), dtype=dtype)
+                self._scales = np.ones(self.capacity, dtype=np.float32)
+                self._slot_ns = np.full(self.capacity, -1, dtype=np.int32)
+                self._slot_expires = np.zeros(self.capacity, dtype=np.float64)
+            elif unit.shape[0] != self._matrix.shape[1]:
+                return
+            ns_id = self._namespaces.setdefault(namespace, len(self._namespaces))
+            if len(self._lru) < self.capacity:
+                slot = len(self._lru)
+            else:
+                slot, _old = self._lru.popitem(last=False)
+            if self.quantize:
+                self._matrix[slot], self._scales[slot] = self._quantized(unit)
+            else:
+                self._matrix[slot] = unit
+            self._slot_ns[slot] = ns_id
+            self._slot_expires[slot] = time.monotonic() + self.ttl_sec
+            self._lru[slot] = value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+            self._namespaces.clear()
+            self._matrix = None
+            self._scales = None
+            self._slot_ns = None
+            self._slot_expires = None
+
+
+citation_cache = SemanticCache(
+    SEMANTIC_CACHE_CAPACITY if SEMANTIC_CACHE_ENABLED else 0,
+    SEMANTIC_CACHE_TTL_SEC,
+    SEMANTIC_CACHE_THRESHOLD,
+    quantize=SEMANTIC_CACHE_INT8,
+)
@@ -0,0 +1,16 @@
+-- user_session: look sessions up by SHA-256(token) instead of the raw token.
+-- The raw token only lives on the client; the server keeps a 32-byte digest.
+BEGIN;
+
+ALTER TABLE user_session ADD COLUMN IF NOT EXISTS session_token_sha256 BYTEA;
+
+UPDATE user_session
+SET session_token_sha256 = sha256(convert_to(session_token, 'UTF8'))
+WHERE session_token_sha256 IS NULL;
+
+ALTER TABLE user_session DROP CONSTRAINT IF EXISTS user_session_pkey;
+ALTER TABLE user_session ALTER COLUMN session_token_sha256 SET NOT NULL;
+ALTER TABLE user_session ADD PRIMARY KEY (session_token_sha256);
+ALTER TABLE user_session DROP COLUMN IF EXISTS session_token;
+
+COMMIT;
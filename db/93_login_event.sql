@@ -0,0 +1,43 @@
+-- login_event: append-only queue for app_user.last_login.
+-- Logins insert here instead of updating app_user; flush_login_events()
+-- folds the queue into app_user in one statement.
+BEGIN;
+
+CREATE UNLOGGED TABLE IF NOT EXISTS login_event (
+  user_id TEXT NOT NULL,
+  at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION flush_login_events() RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+  updated integer;
+BEGIN
+  WITH drained AS (
+    DELETE FROM login_event
+    RETURNING user_id, at
+  ), latest AS (
+    SELECT user_id, max(at) AS at
+    FROM drained
+    GROUP BY user_id
+  )
+  UPDATE app_user u
+  SET last_login = GREATEST(u.last_login, latest.at)
+  FROM latest
+  WHERE u.user_id = latest.user_id;
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN updated;
+END;
+$$;
+
+COMMIT;
+
+-- pg_cron이 설치된 경우 10초마다 반영합니다. 없으면 외부 스케줄러에서
+-- SELECT flush_login_events(); 를 주기적으로 실행하세요.
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('flush_login_events', '10 seconds', 'SELECT flush_login_events()');
+  END IF;
+END;
+$$;
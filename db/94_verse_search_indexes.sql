@@ -0,0 +1,13 @@
+-- bible_verse: indexes behind search_verses / search_verses_first_hit.
+-- search_vector is matched with @@, normalized with ILIKE and the pg_trgm `%`
+-- operator; with both GIN indexes the whole OR filter becomes a BitmapOr
+-- instead of a sequential scan over every verse of the version.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS bible_verse_search_vector_gin
+  ON bible_verse USING GIN (search_vector);
+
+CREATE INDEX IF NOT EXISTS bible_verse_normalized_trgm_gin
+  ON bible_verse USING GIN (normalized gin_trgm_ops);
+
+ANALYZE bible_verse;
@@ -38,6 +38,14 @@ def _vector_literal(values: List[float]) -> str:
     return "[" + ",".join(f"{v:.6f}" for v in values) + "]"
 
 
+def _valid_embedding(embedding) -> List[float] | None:
+    if not isinstance(embedding, list):
+        return None
+    if EMBEDDING_DIM and len(embedding) != EMBEDDING_DIM:
+        return None
+    return embedding
+
+
 def _embed_text(text: str) -> List[float] | None:
     payload = {"model": OLLAMA_EMBED_MODEL, "prompt": text}
     try:
@@ -46,12 +54,26 @@ def _embed_text(text: str) -> List[float] | None:
         data = res.json()
     except requests.RequestException:
         return None
-    embedding = data.get("embedding")
-    if not isinstance(embedding, list):
-        return None
-    if EMBEDDING_DIM and len(embedding) != EMBEDDING_DIM:
-        return None
-    return embedding
+    return _valid_embedding(data.get("embedding"))
+
+
+def _embed_texts(texts: List[str]) -> List[List[float] | None]:
+    if not texts:
+        return []
+    payload = {"model": OLLAMA_EMBED_MODEL, "input": texts}
+    try:
+        res = requests.post(
+            f"{OLLAMA_URL}/api/embed",
+            json=payload,
+            timeout=OLLAMA_TIMEOUT_SEC * max(1, len(texts) / 8),
+        )
+        res.raise_for_status()
+        embeddings = res.json().get("embeddings")
+    except requests.RequestException:
+        embeddings = None
+    if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+        return [_embed_text(text) for text in texts]
+    return [_valid_embedding(embedding) for embedding in embeddings]
 
 
 def _fetch_chapter_verses(conn, version_id: str, book_id: int, chapter: int) -> List[Tuple[int, str]]:
@@ -103,8 +125,8 @@ def main():
                 verses = _fetch_chapter_verses(conn, VERSION_ID, book_id, chapter)
                 windows = _build_windows(verses)
                 batch = []
-                for verse_start, verse_end, text, normalized in windows:
-                    embedding = _embed_text(normalized or text)
+                embeddings = _embed_texts([normalized or text for _s, _e, text, normalized in windows])
+                for (verse_start, verse_end, text, normalized), embedding in zip(windows, embeddings):
                     if not embedding:
                         continue
                     batch.append(
@@ -4,16 +4,19 @@ import hashlib
 import time
 import os
 
+WHITESPACE_RE = re.compile(r"\s+")
+PUNCT_RE = re.compile(r"[,:;.!?\"'()\[\]{}]")
+
 def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
 def normalize_text(s: str) -> str:
     # ⚠️ 크롤링 도중 변경 금지
     s = s.replace("\xa0", " ")
-    s = re.sub(r"\s+", " ", s).strip()
+    s = WHITESPACE_RE.sub(" ", s).strip()
     # 구두점 공백화(검색 품질 ↑)
-    s = re.sub(r"[,:;.!?\"'()\[\]{}]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
+    s = PUNCT_RE.sub(" ", s)
+    s = WHITESPACE_RE.sub(" ", s).strip()
     return s
 
 def chapter_hash(verses):
@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+import pytest
+
+# Set before api.chat is imported: events queued by one test can still be
+# flushed by the background writer after its fixture is undone.
+os.environ["EVENT_LOG_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bible-events-"), "events.log")
+
+import api.chat as chat  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _event_log_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat, "EVENT_LOG_PATH", str(tmp_path / "events.log"))
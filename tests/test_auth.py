@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api.auth import (
+    ARGON2_PARAMS_PREFIX,
+    flush_session_touches,
+    get_session,
+    needs_password_upgrade,
+    revoke_session,
+    touch_session,
+    validate_email,
+    verify_password_or_dummy,
+    warm_dummy_password_hash,
+)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.connection = conn
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.connection.queries.append(query)
+        self.rowcount = 1
+
+    def fetchone(self):
+        return self.connection.row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class FakeConn:
+    def __init__(self, row=None):
+        self.row = row
+        self.queries = []
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+
+def test_validate_email_accepts_simple_address():
+    assert validate_email("user@example.com")
+    assert validate_email("a.b+tag@sub.example.co.kr")
+
+
+def test_validate_email_rejects_malformed():
+    assert not validate_email("")
+    assert not validate_email("user.example.com")
+    assert not validate_email("user@@example.com")
+    assert not validate_email("@example.com")
+    assert not validate_email("user@example")
+    assert not validate_email("user@.com")
+    assert not validate_email("user@example.")
+    assert not validate_email("us er@example.com")
+
+
+def test_needs_password_upgrade_by_prefix():
+    current = ARGON2_PARAMS_PREFIX + "A" * 22 + "$" + "B" * 43
+    assert not needs_password_upgrade(current)
+    assert needs_password_upgrade("pbkdf2_sha256$120000$c2FsdA==$ZGlnZXN0")
+    assert needs_password_upgrade("$argon2id$v=19$m=102400,t=2,p=8$" + "A" * 22 + "$" + "B" * 43)
+    assert needs_password_upgrade(ARGON2_PARAMS_PREFIX + "A" * 11 + "$" + "B" * 43)
+
+
+def test_unknown_email_login_uses_prewarmed_dummy_hash(monkeypatch):
+    import api.auth as auth
+
+    warm_dummy_password_hash()
+
+    def fail_hash(_password):
+        raise AssertionError("dummy hash should already be built")
+
+    monkeypatch.setattr(auth, "hash_password", fail_hash)
+    assert verify_password_or_dummy("guess", None) is False
+
+
+def test_get_session_served_from_cache_until_revoked():
+    expires_at = datetime.now(timezone.utc) + timedelta(days=1)
+    conn = FakeConn(row=("user-1", expires_at))
+
+    first = get_session(conn, "cache-token")
+    second = get_session(conn, "cache-token")
+    assert first == second
+    assert first.user_id == "user-1"
+    assert [q.split()[0] for q in conn.queries] == ["PREPARE", "EXECUTE"]
+
+    revoke_session(conn, "cache-token")
+    conn.row = None
+    assert get_session(conn, "cache-token") is None
+
+
+def test_failed_prepare_is_retried_on_the_same_connection():
+    class FlakyCursor(FakeCursor):
+        def execute(self, query, params=None):
+            super().execute(query, params)
+            if query.startswith("PREPARE") and len(self.connection.queries) == 1:
+                raise RuntimeError("connection hiccup")
+
+    conn = FakeConn(row=None)
+    conn.cursor = lambda cursor_factory=None: FlakyCursor(conn)
+
+    with pytest.raises(RuntimeError):
+        get_session(conn, "flaky-token")
+    assert get_session(conn, "flaky-token") is None
+    assert [q.split()[0] for q in conn.queries] == ["PREPARE", "PREPARE", "EXECUTE"]
+
+
+def test_session_touches_are_committed_and_requeued_on_failure(monkeypatch):
+    class TxConn(FakeConn):
+        fail = False
+
+        def cursor(self, cursor_factory=None):
+            if self.fail:
+                raise RuntimeError("db down")
+            return FakeCursor(self)
+
+        def commit(self):
+            self.queries.append("COMMIT")
+
+        def rollback(self):
+            self.queries.append("ROLLBACK")
+
+    monkeypatch.setattr("api.auth.SESSION_TOUCH_FLUSH_SEC", 3600)
+    conn = TxConn()
+    flush_session_touches(conn)
+    touch_session(conn, "touch-token")
+    assert conn.queries == []
+
+    conn.fail = True
+    with pytest.raises(RuntimeError):
+        flush_session_touches(conn)
+    assert conn.queries == ["ROLLBACK"]
+
+    conn.fail = False
+    flush_session_touches(conn)
+    assert "UPDATE user_session" in conn.queries[1]
+    assert conn.queries[2] == "COMMIT"
@@ -0,0 +1,84 @@
+import random
+
+import api.chat as chat
+
+
+def test_keyword_hits_count_distinct_overlapping_terms():
+    items = [{"text": "사랑하는 자들아 사랑은 오래 참고"}, {"text": "믿음 소망"}]
+    chat._count_keyword_hits(items, ["사랑", "사랑하는", "소망"])
+    assert items[0]["keyword_hits"] == 2
+    assert items[1]["keyword_hits"] == 1
+
+
+def test_keyword_hits_prefer_stored_normalized_text(monkeypatch):
+    monkeypatch.setattr(chat, "normalize_text", lambda _text: "")
+    items = [{"text": "사랑은, 오래 참고", "text_norm": "사랑은 오래 참고"}]
+    chat._count_keyword_hits(items, ["사랑", "참고"])
+    assert items[0]["keyword_hits"] == 2
+
+
+def test_keyword_hits_memoize_missing_normalized_text(monkeypatch):
+    calls = []
+
+    def fake_normalize(text):
+        calls.append(text)
+        return text.replace(",", "")
+
+    chat._normalize_verse_text.cache_clear()
+    monkeypatch.setattr(chat, "normalize_text", fake_normalize)
+    first = [{"text": "사랑은, 오래 참고"}]
+    second = [{"text": "사랑은, 오래 참고"}]
+    chat._count_keyword_hits(first, ["사랑", "참고"])
+    chat._count_keyword_hits(second, ["사랑"])
+    assert first[0]["text_norm"] == "사랑은 오래 참고"
+    assert second[0]["keyword_hits"] == 1
+    assert calls == ["사랑은, 오래 참고"]
+    chat._normalize_verse_text.cache_clear()
+
+
+def test_keyword_hits_zero_without_terms():
+    items = [{"text": "태초에"}]
+    chat._count_keyword_hits(items, [])
+    assert items[0]["keyword_hits"] == 0
+
+
+def test_sort_candidates_matches_sort_key():
+    rng = random.Random(7)
+    items = [
+        {
+            "verse": idx,
+            "keyword_hits": rng.randint(0, 2),
+            "rank": rng.choice([None, 0.1, 0.5]),
+            "trgm_sim": rng.choice([None, 0.2, 0.4]),
+            "vector_distance": rng.choice([None, 0.3, 0.6]),
+        }
+        for idx in range(40)
+    ]
+    expected = sorted(items, key=chat._candidate_sort_key)
+    assert [i["verse"] for i in chat._sort_candidates(list(items))] == [i["verse"] for i in expected]
+
+
+def test_keyword_hits_paths_agree(monkeypatch):
+    items = [{"text": "사랑하는 자들아 사랑은 오래 참고"}, {"text": "믿음 소망"}]
+    terms = ["사랑", "사랑하는", "소망", "참고"]
+    chat._count_keyword_hits(items, terms)
+    direct = [item["keyword_hits"] for item in items]
+    monkeypatch.setattr(chat, "SCORE_TERMS_DIRECT_MAX", 0)
+    chat._count_keyword_hits(items, terms)
+    assert [item["keyword_hits"] for item in items] == direct == [3, 1]
+
+
+def test_fts_confident_requires_rank_and_keyword_hits():
+    strong = [{"text": "수고하고 무거운 짐 진 자들아 다 내게로 오라", "rank": 0.8}]
+    assert chat._fts_confident(strong, ["수고", "무거운", "평안"])
+    assert not chat._fts_confident(strong, ["수고", "평안"])
+    assert not chat._fts_confident([{"text": strong[0]["text"], "rank": 0.1}], ["수고", "무거운"])
+    assert not chat._fts_confident(strong, [])
+    assert not chat._fts_confident([], ["수고"])
+
+
+def test_keyword_hits_count_terms_nested_at_the_same_position(monkeypatch):
+    monkeypatch.setattr(chat, "SCORE_TERMS_DIRECT_MAX", 0)
+    items = [{"text": "사랑하는 자들아"}]
+    chat._count_keyword_hits(items, ["사랑", "사랑하는", "믿음"])
+    assert items[0]["keyword_hits"] == 2
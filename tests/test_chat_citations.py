@@ -80,3 +80,23 @@ def test_append_range_formatting():
     ]
     response = append_citations_to_response("", citations)
     assert "(로마서 8:1-2) 내용" in response
+
+
+def test_precomputed_citation_text_is_reused():
+    from api.chat import append_citations_to_response, format_citations
+
+    citations = [
+        {
+            "version_id": "krv",
+            "book_id": 1,
+            "book_name": "창세기",
+            "chapter": 1,
+            "verse_start": 1,
+            "verse_end": 1,
+            "text": "태초에 하나님이 천지를 창조하시니라",
+        }
+    ]
+    citation_text = format_citations(citations)
+    assert citation_text == "(창세기 1:1) 태초에 하나님이 천지를 창조하시니라"
+    response = append_citations_to_response("응답", citations, citation_text)
+    assert enforce_exact_citations(response, citations, citation_text) == (response, citations)
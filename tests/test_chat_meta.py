@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import api.chat_meta as chat_meta
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def hgetall(self, key):
+        self.commands.append(("hgetall", key))
+
+    def get(self, key):
+        self.commands.append(("get", key))
+
+    def execute(self):
+        self.client.round_trips += 1
+        return [self.client.hashes.get(key, {}) if op == "hgetall" else self.client.values.get(key) for op, key in self.commands]
+
+
+class FakeRedis:
+    def __init__(self, hashes, values):
+        self.hashes = hashes
+        self.values = values
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        assert transaction is False
+        return FakePipeline(self)
+
+
+def test_meta_and_daily_usage_share_one_round_trip(monkeypatch):
+    daily_key = chat_meta._daily_key("device", "dev-1", chat_meta._kst_day()[0])
+    client = FakeRedis(
+        {"chat:meta:c1": {"mode": "anonymous", "store_messages": "0", "turn_limit": "10", "turn_count": "3"}},
+        {daily_key: "4"},
+    )
+    monkeypatch.setattr(chat_meta, "_get_redis", lambda: client)
+
+    meta, daily = chat_meta.get_meta_and_daily_usage("c1", "dev-1", 10)
+
+    assert client.round_trips == 1
+    assert meta["mode"] == "anonymous"
+    assert meta["turn_count"] == 3
+    assert daily == {"count": 4, "limit": 10, "remaining": 6}
+
+
+def test_daily_usage_only_reported_for_anonymous(monkeypatch):
+    client = FakeRedis({"chat:meta:c2": {"mode": "authenticated", "store_messages": "1"}}, {})
+    monkeypatch.setattr(chat_meta, "_get_redis", lambda: client)
+
+    meta, daily = chat_meta.get_meta_and_daily_usage("c2", "dev-1", 10)
+
+    assert meta["store_messages"] is True
+    assert daily is None
+
+
+def test_turn_enforcement_checks_daily_limit_first(monkeypatch):
+    monkeypatch.setattr(chat_meta, "_get_redis", lambda: None)
+    monkeypatch.setattr(chat_meta, "_MEM_STORE", chat_meta.OrderedDict())
+    monkeypatch.setattr(chat_meta, "_MEM_DAILY", chat_meta.OrderedDict())
+    chat_meta.init_conversation_meta("c3", "anonymous", False, None, 10)
+
+    first = chat_meta.enforce_turn_and_increment("c3", "dev-1", 1)
+    second = chat_meta.enforce_turn_and_increment("c3", "dev-1", 1)
+
+    assert first["status"] == "ok"
+    assert first["turn_count"] == 1
+    assert first["daily"] == {"status": "ok", "count": 1, "limit": 1}
+    assert second["status"] == "daily_limit"
+    assert second["daily"]["count"] == 2
+    assert chat_meta.get_conversation_meta("c3")["turn_count"] == 1
+
+
+def test_memory_fallback_is_bounded_lru(monkeypatch):
+    monkeypatch.setattr(chat_meta, "_get_redis", lambda: None)
+    monkeypatch.setattr(chat_meta, "_MEM_STORE", chat_meta.OrderedDict())
+    monkeypatch.setattr(chat_meta, "MEM_STORE_MAX", 2)
+    chat_meta.init_conversation_meta("a", "authenticated", True, None, 0)
+    chat_meta.init_conversation_meta("b", "authenticated", True, None, 0)
+    assert chat_meta.get_conversation_meta("a") is not None
+    chat_meta.init_conversation_meta("c", "authenticated", True, None, 0)
+
+    assert chat_meta.get_conversation_meta("b") is None
+    assert chat_meta.get_conversation_meta("a") is not None
+    assert chat_meta.get_conversation_meta("c") is not None
+
+
+def test_kst_day_matches_calendar_math():
+    kst = timezone(timedelta(hours=9))
+    for now in (
+        datetime(2026, 3, 1, 14, 59, 59, tzinfo=timezone.utc),
+        datetime(2026, 3, 1, 15, 0, 0, tzinfo=timezone.utc),
+        datetime(2026, 12, 31, 23, 0, 0, tzinfo=timezone.utc),
+    ):
+        local = now.astimezone(kst)
+        midnight = datetime.combine(local.date() + timedelta(days=1), datetime.min.time(), tzinfo=kst)
+        expected = (local.strftime("%Y%m%d"), max(int((midnight - local).total_seconds()), 60))
+        assert chat_meta._kst_day(now.timestamp()) == expected
+
+
+@pytest.fixture
+def lua_redis(monkeypatch):
+    # Runs the registered scripts for real; needs fakeredis[lua] (lupa).
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(chat_meta, "_get_redis", lambda: client)
+    monkeypatch.setattr(chat_meta, "_TURN_SCRIPT", client.register_script(chat_meta._TURN_CHECK_LUA))
+    monkeypatch.setattr(chat_meta, "_DAILY_SCRIPT", client.register_script(chat_meta._DAILY_LIMIT_LUA))
+    monkeypatch.setattr(chat_meta, "_INIT_SCRIPT", client.register_script(chat_meta._INIT_META_LUA))
+    return client
+
+
+def test_turn_script_enforces_daily_and_turn_limits(lua_redis):
+    chat_meta.init_conversation_meta("c5", "anonymous", False, None, 2)
+
+    first = chat_meta.enforce_turn_and_increment("c5", "dev-5", 2)
+    second = chat_meta.enforce_turn_and_increment("c5", "dev-5", 5)
+    third = chat_meta.enforce_turn_and_increment("c5", "dev-5", 5)
+    blocked = chat_meta.enforce_turn_and_increment("c5", "dev-5", 3)
+
+    assert first == {
+        "status": "ok",
+        "turn_count": 1,
+        "turn_limit": 2,
+        "expires_at": None,
+        "daily": {"status": "ok", "count": 1, "limit": 2},
+    }
+    assert second["status"] == "ok" and second["turn_count"] == 2
+    assert third["status"] == "limit" and third["daily"]["count"] == 3
+    assert blocked["status"] == "daily_limit" and blocked["daily"]["count"] == 4
+    assert chat_meta.get_conversation_meta("c5")["turn_count"] == 2
+
+    daily_key = chat_meta._daily_key("device", "dev-5", chat_meta._kst_day()[0])
+    assert 0 < lua_redis.ttl(daily_key) <= 86400
+    assert chat_meta.enforce_turn_and_increment("missing")["status"] == "not_found"
+
+
+def test_turn_script_reports_expired_conversation(lua_redis):
+    lua_redis.hset("chat:meta:c6", mapping={"expires_at_ts": "1", "turn_limit": "10", "turn_count": "0"})
+
+    result = chat_meta.enforce_turn_and_increment("c6")
+
+    assert result["status"] == "expired"
+    assert result["expires_at"] == chat_meta._iso_from_ts(1)
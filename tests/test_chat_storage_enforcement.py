@@ -1,3 +1,5 @@
+from types import SimpleNamespace
+
 import api.main as main_mod
 from api.chat import store
 from api.models import ChatMessageRequest
@@ -6,9 +8,13 @@ from api.models import ChatMessageRequest
 class FakeCursor:
     def __init__(self):
         self.queries = []
+        self.connection = SimpleNamespace(encoding="UTF8")
+
+    def mogrify(self, template, args):
+        return (template % tuple(repr(arg) for arg in args)).encode("utf-8")
 
     def execute(self, query, params=None):
-        self.queries.append(str(query))
+        self.queries.append(query.decode("utf-8") if isinstance(query, bytes) else str(query))
 
     def __enter__(self):
         return self
@@ -51,7 +57,7 @@ def _prepare(monkeypatch, store_messages: bool):
     monkeypatch.setattr(
         main_mod,
         "enforce_turn_and_increment",
-        lambda _cid: {
+        lambda _cid, *_args, **_kwargs: {
             "status": "ok",
             "turn_count": 1,
             "turn_limit": 10,
@@ -118,8 +124,11 @@ def test_anonymous_daily_limit_blocks(monkeypatch):
     )
     monkeypatch.setattr(
         main_mod,
-        "enforce_anonymous_daily_limit",
-        lambda *_args, **_kwargs: {"status": "limit", "count": 11, "limit": 10},
+        "enforce_turn_and_increment",
+        lambda *_args, **_kwargs: {
+            "status": "daily_limit",
+            "daily": {"status": "limit", "count": 11, "limit": 10},
+        },
     )
     payload = ChatMessageRequest(user_message="테스트 메시지", client_context=None)
     try:
@@ -129,3 +138,33 @@ def test_anonymous_daily_limit_blocks(monkeypatch):
     else:
         raise AssertionError("expected daily limit enforcement")
     store.delete(conversation_id)
+
+
+def test_user_message_is_written_when_the_turn_fails(monkeypatch):
+    conversation_id, conn, cursor = _prepare(monkeypatch, store_messages=True)
+
+    def fail(*_args, **_kwargs):
+        raise main_mod.HTTPException(status_code=404, detail="book not found")
+
+    monkeypatch.setattr(main_mod, "extract_reference", lambda _text: ("창세기", 1, 1, 1))
+    monkeypatch.setattr(main_mod, "_fetch_book_and_verse", fail)
+    payload = ChatMessageRequest(user_message="창세기 1:1", client_context=None)
+    try:
+        main_mod.post_message(conversation_id, payload, conn=conn)
+    except main_mod.HTTPException as exc:
+        assert exc.status_code == 404
+    else:
+        raise AssertionError("expected book lookup failure")
+
+    assert _chat_insert_count(cursor) == 1
+    assert not store._pending
+    store.delete(conversation_id)
+
+
+def test_delete_drops_pending_messages():
+    record = store.create(device_id="test", locale="ko-KR", version_id="krv", store_messages=True)
+    conversation_id = record["conversation_id"]
+    conn = FakeConn(FakeCursor())
+    store.add_message(conversation_id, "user", "안녕하세요", conn=conn, defer=True)
+    store.delete(conversation_id)
+    assert conversation_id not in store._pending
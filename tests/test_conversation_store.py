@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+from api.chat import ConversationStore
+
+
+class FakeCursor:
+    def __init__(self):
+        self.connection = SimpleNamespace(encoding="UTF8")
+        self.statements = []
+
+    def mogrify(self, template, args):
+        return (template % tuple(repr(arg) for arg in args)).encode("utf-8")
+
+    def execute(self, query, params=None):
+        self.statements.append(query.decode("utf-8") if isinstance(query, bytes) else query)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class FakeConn:
+    def __init__(self):
+        self.cur = FakeCursor()
+        self.commits = 0
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def test_deferred_user_message_is_flushed_with_reply():
+    store = ConversationStore()
+    record = store._mem_create("device", "ko-KR", "krv", True)
+    conn = FakeConn()
+
+    store.add_message(record["conversation_id"], "user", "안녕하세요", conn=conn, defer=True)
+    assert conn.cur.statements == []
+    store.add_message(record["conversation_id"], "assistant", "반가워요", conn=conn)
+
+    assert conn.commits == 1
+    assert len(conn.cur.statements) == 1
+    statement = conn.cur.statements[0]
+    assert statement.index("'안녕하세요'") < statement.index("'반가워요'")
+    assert [m["role"] for m in record["messages"]] == ["user", "assistant"]
+
+
+def test_messages_are_not_written_without_store_messages():
+    store = ConversationStore()
+    record = store._mem_create("device", "ko-KR", "krv", False)
+    conn = FakeConn()
+    store.add_message(record["conversation_id"], "user", "안녕하세요", conn=conn)
+    assert conn.cur.statements == []
+    assert conn.commits == 0
+
+
+def test_uncached_message_is_inserted_without_loading_conversation():
+    store = ConversationStore()
+    conn = FakeConn()
+    conn.cur.connection = conn
+
+    store.add_message("missing", "assistant", "반가워요", conn=conn)
+
+    assert len(conn.cur.statements) == 2
+    assert conn.cur.statements[0].startswith("PREPARE chat_message_insert_uncached")
+    assert "store_messages" in conn.cur.statements[0]
+    assert conn.cur.statements[1].startswith("EXECUTE chat_message_insert_uncached")
+    assert not any("SELECT conversation_id, device_id" in q for q in conn.cur.statements)
+    assert conn.commits == 1
+    assert store.get("missing") is None
+
+
+def test_conversation_cache_evicts_least_recently_used(monkeypatch):
+    import api.chat as chat
+
+    monkeypatch.setattr(chat, "CONVERSATION_CACHE_MAX", 2)
+    store = ConversationStore()
+    first = store._mem_create("device", "ko-KR", "krv", False)
+    second = store._mem_create("device", "ko-KR", "krv", False)
+    assert store.get(first["conversation_id"]) is first
+    third = store._mem_create("device", "ko-KR", "krv", False)
+
+    assert store.get(second["conversation_id"]) is None
+    assert store.get(first["conversation_id"]) is first
+    assert store.get(third["conversation_id"]) is third
@@ -0,0 +1,29 @@
+import api.chat as chat
+
+
+def test_embed_text_reuses_cached_embedding(monkeypatch):
+    calls = []
+
+    def fake_embed_texts(texts):
+        calls.append(texts)
+        return [[0.1, 0.2]]
+
+    monkeypatch.setattr(chat, "EMBED_CACHE", chat.OrderedDict())
+    monkeypatch.setattr(chat, "_embed_texts", fake_embed_texts)
+    assert chat._embed_text("잠이 안 와요") == [0.1, 0.2]
+    assert chat._embed_text("잠이  안 와요") == [0.1, 0.2]
+    assert calls == [["잠이 안 와요"]]
+
+
+def test_embed_text_does_not_cache_failures(monkeypatch):
+    calls = []
+
+    def fake_embed_texts(texts):
+        calls.append(texts)
+        return [None]
+
+    monkeypatch.setattr(chat, "EMBED_CACHE", chat.OrderedDict())
+    monkeypatch.setattr(chat, "_embed_texts", fake_embed_texts)
+    assert chat._embed_text("불안") is None
+    assert chat._embed_text("불안") is None
+    assert len(calls) == 2
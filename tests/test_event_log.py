@@ -0,0 +1,47 @@
+import json
+import time
+from types import SimpleNamespace
+
+import api.chat as chat
+
+
+def _read_events(path):
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_log_event_is_written_in_background(tmp_path, monkeypatch):
+    path = tmp_path / "events.log"
+    monkeypatch.setattr(chat, "EVENT_LOG_PATH", str(path))
+    chat._log_event("test_event", {"conversation_id": "abc", "elapsed_ms": 12})
+
+    deadline = time.monotonic() + 2
+    records = []
+    while not records and time.monotonic() < deadline:
+        time.sleep(0.01)
+        records = [r for r in _read_events(path) if r["event_type"] == "test_event"]
+    assert len(records) == 1
+    assert records[0]["elapsed_ms"] == 12
+    assert records[0]["conversation_id"] != "abc"
+
+
+def test_event_log_reopens_after_rotation(tmp_path, monkeypatch):
+    path = tmp_path / "events.log"
+    monkeypatch.setattr(chat, "EVENT_LOG_PATH", str(path))
+    chat._write_event_lines([b'{"event_type": "before"}\n'])
+    path.rename(tmp_path / "events.log.1")
+    chat._write_event_lines([b'{"event_type": "after"}\n'])
+    assert [r["event_type"] for r in _read_events(path)] == ["after"]
+
+
+def test_log_event_lines_are_valid_json(monkeypatch):
+    lines = []
+    monkeypatch.setattr(chat, "EVENT_QUEUE", SimpleNamespace(put=lines.append))
+    chat._log_event("empty_event", {})
+    chat._log_event("payload_event", {"elapsed_ms": 3, "items": [{"book_id": 1}]})
+
+    empty, full = (json.loads(line) for line in lines)
+    assert empty["event_type"] == "empty_event"
+    assert full == {"event_type": "payload_event", "ts": full["ts"], "elapsed_ms": 3, "items": [{"book_id": 1}]}
+    assert chat.datetime.fromisoformat(full["ts"]).utcoffset().total_seconds() == 0
@@ -0,0 +1,15 @@
+from api.chat import _extract_json
+
+
+def test_extract_json_plain_object():
+    assert _extract_json('{"need_verse": true}') == {"need_verse": True}
+
+
+def test_extract_json_skips_preface_and_trailing_text():
+    text = 'Sure {not json} here: {"scores": [{"index": 1, "score": 0.5}]} hope this helps {}'
+    assert _extract_json(text) == {"scores": [{"index": 1, "score": 0.5}]}
+
+
+def test_extract_json_none_without_object():
+    assert _extract_json("no json here") is None
+    assert _extract_json("") is None
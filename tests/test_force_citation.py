@@ -11,10 +11,10 @@ class FakeCursor:
         self._rows = []
 
     def execute(self, query, params):
-        if "WHERE v.version_id = %s AND v.book_id = %s AND v.chapter = %s AND v.verse = %s" in query:
-            key = (params[1], params[2], params[3])
-            self._row = self._data.get(key)
-            self._rows = []
+        if "ORDER BY refs.ord" in query:
+            refs = [tuple(params[idx + 1 : idx + 4]) for idx in range(0, len(params) - 1, 4)]
+            self._rows = [self._data[key] for key in refs if key in self._data]
+            self._row = None
             return
         if "ORDER BY v.book_id, v.chapter, v.verse" in query:
             self._rows = list(self._data.values())
@@ -70,27 +70,15 @@ def test_no_forced_citation_without_triggers(monkeypatch):
     monkeypatch.setattr(main_mod, "_verify_citations", lambda _conn, citations: citations)
     monkeypatch.setattr(
         chat_mod,
-        "search_verses",
-        lambda _conn, _version_id, _query, _limit, _offset: {"total": 0, "items": []},
+        "search_verses_first_hit",
+        lambda _conn, _version_id, _queries, _limit: (-1, []),
     )
     monkeypatch.setattr(chat_mod, "VECTOR_ENABLED", False)
     monkeypatch.setattr(chat_mod, "RERANK_MODE", "off")
 
     data_by_key = {
-        (19, 23, 1): {
-            "book_id": 19,
-            "book_name": "시편",
-            "chapter": 23,
-            "verse": 1,
-            "text": "여호와는 나의 목자시니 내게 부족함이 없으리로다",
-        },
-        (40, 11, 28): {
-            "book_id": 40,
-            "book_name": "마태복음",
-            "chapter": 11,
-            "verse": 28,
-            "text": "수고하고 무거운 짐 진 자들아 다 내게로 오라 내가 너희를 쉬게 하리라",
-        },
+        (19, 23, 1): (19, "시편", 23, 1, "여호와는 나의 목자시니 내게 부족함이 없으리로다"),
+        (40, 11, 28): (40, "마태복음", 11, 28, "수고하고 무거운 짐 진 자들아 다 내게로 오라 내가 너희를 쉬게 하리라"),
     }
     conn = FakeConn(FakeCursor(data_by_key))
 
@@ -99,3 +87,30 @@ def test_no_forced_citation_without_triggers(monkeypatch):
 
     assert response["memory"]["gating"]["need_verse"] is False
     assert response["citations"] == []
+
+
+def test_fallback_citations_keep_reference_order(monkeypatch):
+    monkeypatch.setattr(chat_mod, "FALLBACK_REFS_CACHE", {})
+    data_by_key = {
+        (40, 11, 28): (40, "마태복음", 11, 28, "b"),
+        (19, 23, 1): (19, "시편", 23, 1, "a"),
+    }
+    conn = FakeConn(FakeCursor(data_by_key))
+    citations = chat_mod._fallback_citations(conn, "krv", 2)
+    assert [(c["book_id"], c["chapter"], c["verse_start"]) for c in citations] == [(19, 23, 1), (40, 11, 28)]
+    assert [c["book_name"] for c in citations] == ["시편", "마태복음"]
+
+
+def test_fallback_references_are_fetched_once_per_version(monkeypatch):
+    monkeypatch.setattr(chat_mod, "FALLBACK_REFS_CACHE", {})
+    cursor = FakeCursor({(19, 23, 1): (19, "시편", 23, 1, "a"), (40, 11, 28): (40, "마태복음", 11, 28, "b")})
+    queries = []
+    execute = cursor.execute
+    monkeypatch.setattr(cursor, "execute", lambda query, params: queries.append(query) or execute(query, params))
+    conn = FakeConn(cursor)
+
+    first = chat_mod._fallback_citations(conn, "krv", 2)
+    first[0]["text"] = "changed"
+    second = chat_mod._fallback_citations(conn, "krv", 2)
+    assert len(queries) == 1
+    assert [c["text"] for c in second] == ["a", "b"]
@@ -0,0 +1,117 @@
+from concurrent.futures import Future
+
+from api.chat import _is_info_request, _is_small_talk, _mask_pii, _risk_flags, _rule_based_gating, infer_topics
+
+
+def test_risk_flags():
+    assert _risk_flags("요즘 죽고 싶어요") == ["self_harm"]
+    assert _risk_flags("오늘은 괜찮아요") == []
+
+
+def test_mask_pii_single_pass():
+    text = "연락처 010-1234-5678, 주민번호 900101-1234567, 계좌 123-45-67890"
+    assert _mask_pii(text) == "연락처 [PHONE], 주민번호 [RRN], 계좌 [BANK]"
+    assert _mask_pii("오늘은 괜찮아요") == "오늘은 괜찮아요"
+
+
+def test_infer_topics_keeps_lexicon_order():
+    assert infer_topics("가족 때문에 걱정이 많아요") == ["anxiety", "relationships"]
+
+
+def test_small_talk_and_info_request():
+    assert _is_small_talk("ㅋㅋ 고마워")
+    assert not _is_small_talk("고마워요, 기도해 주세요")
+    assert _is_info_request("은혜의 의미가 뭐야", [])
+    assert not _is_info_request("성경 구절 알려줘", [])
+
+
+def test_rule_based_gating_explicit_request():
+    rule = _rule_based_gating("요즘 너무 불안해요 말씀 주세요", "", None)
+    assert rule["need_verse"] is True
+    assert rule["topics"] == ["anxiety"]
+    assert rule["trigger_reason"] == ["explicit_request", "strong_emotion"]
+
+
+def test_gate_need_verse_skips_llm_when_rules_decide(monkeypatch):
+    import api.chat as chat
+
+    def fail(*_args, **_kwargs):
+        raise AssertionError("llm should not be called")
+
+    monkeypatch.setattr(chat, "generate_with_llm", fail)
+    gate = chat.gate_need_verse("안녕 고마워")
+    assert gate["need_verse"] is False
+    assert gate["source"] == "rule"
+    assert gate["exclude_reason"] == ["small_talk"]
+
+
+def test_gate_need_verse_prefetches_context_embedding(monkeypatch):
+    import api.chat as chat
+
+    submitted = []
+
+    class FakeExecutor:
+        def submit(self, fn, *args):
+            submitted.append((fn, args))
+            return Future()
+
+    monkeypatch.setattr(chat, "VECTOR_ENABLED", True)
+    monkeypatch.setattr(chat, "EMBED_EXECUTOR", FakeExecutor())
+    undecided = {"need_verse": None, "topics": [], "trigger_reason": [], "exclude_reason": []}
+    monkeypatch.setattr(chat, "_rule_based_gating", lambda *_args: undecided)
+    monkeypatch.setattr(chat, "generate_with_llm", lambda *_args, **_kwargs: '{"need_verse": true}')
+    gate = chat.gate_need_verse("요즘 마음이 무거워요", "요약")
+    assert gate["need_verse"] is True
+    assert submitted == [(chat._embed_text, ("요즘 마음이 무거워요 요약",))]
+    chat.EMBED_INFLIGHT.clear()
+
+
+def test_inflight_embedding_is_shared(monkeypatch):
+    import api.chat as chat
+
+    submitted = []
+
+    class FakeExecutor:
+        def submit(self, fn, *args):
+            submitted.append(args)
+            return Future()
+
+    monkeypatch.setattr(chat, "EMBED_EXECUTOR", FakeExecutor())
+    first = chat._submit_embed("요즘 마음이 무거워요")
+    assert chat._submit_embed("요즘  마음이 무거워요") is first
+    first.set_result([0.1])
+    assert chat._submit_embed("요즘 마음이 무거워요") is not first
+    assert len(submitted) == 2
+    chat.EMBED_INFLIGHT.clear()
+
+
+def test_context_and_recent_single_pass():
+    from api.chat import _context_and_recent
+
+    messages = [
+        {"role": "user", "content": "첫째"},
+        {"role": "assistant", "content": "응답"},
+        {"role": "user", "content": ""},
+        {"role": "user", "content": "둘째"},
+        {"role": "user", "content": "지금"},
+    ]
+    context_text, recent = _context_and_recent("지금", "요약", messages)
+    assert recent == ["둘째"]
+    assert context_text == "지금 둘째 요약"
+    assert _context_and_recent("", "", None) == ("", [])
+
+
+def test_risk_flags_share_the_gating_scan():
+    import api.chat as chat
+
+    text = "요즘 너무 불안하고 죽고 싶어요"
+    assert _risk_flags(text) == ["self_harm"]
+    assert infer_topics(text) == ["anxiety"]
+    assert chat._keyword_labels(text) >= {"risk", "topic:anxiety"}
+
+
+def test_explicit_verse_request_matches_keywords_case_insensitively():
+    import api.chat as chat
+
+    texts = ["Bible VERSE please", "오늘 말씀 하나 주세요", "그냥 얘기하고 싶어요"]
+    assert [chat._explicit_verse_request(text) for text in texts] == [True, True, False]
@@ -0,0 +1,108 @@
+import hashlib
+import hmac
+
+import jwt
+
+from api import jwt_utils
+
+
+def test_access_token_matches_pyjwt(monkeypatch):
+    monkeypatch.setattr(jwt_utils, "_now_ts", lambda: 1_700_000_000)
+    token, exp = jwt_utils.create_access_token("user-1", "a@example.com")
+
+    payload = {
+        "sub": "user-1",
+        "email": "a@example.com",
+        "typ": "access",
+        "iat": 1_700_000_000,
+        "exp": exp,
+        "iss": jwt_utils.JWT_ISSUER,
+        "aud": jwt_utils.JWT_AUDIENCE,
+    }
+    assert token == jwt.encode(payload, jwt_utils.JWT_SECRET, algorithm="HS256")
+
+
+def test_refresh_token_round_trips():
+    token, refresh_id, _exp = jwt_utils.create_refresh_token("user-1")
+    payload = jwt_utils.verify_refresh_token(token)
+    assert payload["jti"] == refresh_id
+    assert jwt_utils.verify_access_token(token) is None
+    assert jwt_utils.hash_refresh_id(refresh_id) == hmac.new(
+        jwt_utils.JWT_SECRET.encode("utf-8"), refresh_id.encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+
+
+def _claims(**overrides):
+    now = int(jwt_utils.time.time())
+    payload = {
+        "sub": "user-1",
+        "typ": "access",
+        "iat": now,
+        "exp": now + 60,
+        "iss": jwt_utils.JWT_ISSUER,
+        "aud": jwt_utils.JWT_AUDIENCE,
+    }
+    payload.update(overrides)
+    return {key: value for key, value in payload.items() if value is not None}
+
+
+def _pyjwt_decode(token):
+    try:
+        return jwt.decode(
+            token,
+            jwt_utils.JWT_SECRET,
+            algorithms=["HS256"],
+            issuer=jwt_utils.JWT_ISSUER,
+            audience=jwt_utils.JWT_AUDIENCE,
+        )
+    except jwt.PyJWTError:
+        return None
+
+
+def test_fast_decode_agrees_with_pyjwt(monkeypatch):
+    monkeypatch.setattr(jwt_utils, "JWT_FAST", True)
+    now = int(jwt_utils.time.time())
+    secret = jwt_utils.JWT_SECRET
+    valid = jwt.encode(_claims(), secret, algorithm="HS256")
+    header, body, signature = valid.split(".")
+    tokens = [
+        valid,
+        jwt.encode(_claims(aud=["other", jwt_utils.JWT_AUDIENCE]), secret, algorithm="HS256"),
+        jwt.encode(_claims(exp=now - 1), secret, algorithm="HS256"),
+        jwt.encode(_claims(iat=now + 3600), secret, algorithm="HS256"),
+        jwt.encode(_claims(nbf=now + 3600), secret, algorithm="HS256"),
+        jwt.encode(_claims(exp="soon"), secret, algorithm="HS256"),
+        jwt.encode(_claims(iss="someone-else"), secret, algorithm="HS256"),
+        jwt.encode(_claims(iss=None), secret, algorithm="HS256"),
+        jwt.encode(_claims(aud="other"), secret, algorithm="HS256"),
+        jwt.encode(_claims(aud=None), secret, algorithm="HS256"),
+        jwt.encode(_claims(aud=[jwt_utils.JWT_AUDIENCE, 1]), secret, algorithm="HS256"),
+        jwt.encode(_claims(sub=42), secret, algorithm="HS256"),
+        jwt.encode(_claims(), "wrong-secret-" * 3, algorithm="HS256"),
+        jwt.encode(_claims(), secret, algorithm="HS512"),
+        f"{header}.{body}.{signature[:-2]}",
+        f"{header}.{body}x.{signature}",
+        f"{header}.{body}.{body}.{signature}",
+        f"{header}.{body}.sïgnature",
+        f"{header}..{signature}",
+        "eyJhbGciOiJub25lIiwidHlwIjoiSldUIn0." + body + ".",
+    ]
+    for token in tokens:
+        assert jwt_utils._decode_token(token) == _pyjwt_decode(token), token
+    assert jwt_utils._decode_token(valid)["sub"] == "user-1"
+
+
+def test_fast_decode_requires_numeric_dates(monkeypatch):
+    monkeypatch.setattr(jwt_utils, "JWT_FAST", True)
+    now = int(jwt_utils.time.time())
+    secret = jwt_utils.JWT_SECRET
+    assert jwt_utils._decode_token(jwt.encode(_claims(exp=now + 60.5), secret, algorithm="HS256"))
+    for overrides in (
+        {"exp": "9999999999"},
+        {"iat": str(now)},
+        {"nbf": str(now - 10)},
+        {"exp": True},
+        {"iat": True},
+    ):
+        token = jwt.encode(_claims(**overrides), secret, algorithm="HS256")
+        assert jwt_utils._decode_token(token) is None, overrides
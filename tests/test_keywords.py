@@ -0,0 +1,8 @@
+import api.chat as chat
+
+
+def test_extract_keywords_ranks_by_count_then_length(monkeypatch):
+    monkeypatch.setattr(chat, "_get_kiwi", lambda: None)
+    text = "기도 기도 기도 불안함 불안함 평안 평안 잠 2024 소망"
+    assert chat.extract_keywords(text, limit=3) == ["기도", "불안함", "평안"]
+    assert chat.extract_keywords(text, limit=10) == ["기도", "불안함", "평안", "소망"]
@@ -0,0 +1,31 @@
+import api.chat as chat
+
+
+def test_kobert_cache_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat, "KOBERT_CACHE_PATH", str(tmp_path / "kobert.sqlite"))
+    monkeypatch.setattr(chat, "KOBERT_CACHE", None)
+    key = chat._kobert_cache_key("태초에 하나님이 천지를 창조하시니라")
+    chat._kobert_cache_put({key: b"\x00\x00\x80?"})
+    assert chat._kobert_cache_get([key, "missing"]) == {key: b"\x00\x00\x80?"}
+
+
+def test_kobert_cache_expires_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat, "KOBERT_CACHE_PATH", str(tmp_path / "kobert.sqlite"))
+    monkeypatch.setattr(chat, "KOBERT_CACHE", None)
+    monkeypatch.setattr(chat, "KOBERT_CACHE_TTL_SEC", 60)
+    key = chat._kobert_cache_key("text")
+    chat._kobert_cache_put({key: b"\x00\x00\x80?"})
+    chat.KOBERT_CACHE.execute("UPDATE kobert_cache SET created_at = created_at - 120")
+    assert chat._kobert_cache_get([key]) == {}
+
+
+def test_kobert_cache_keeps_entries_without_ttl(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat, "KOBERT_CACHE_PATH", str(tmp_path / "kobert.sqlite"))
+    monkeypatch.setattr(chat, "KOBERT_CACHE", None)
+    monkeypatch.setattr(chat, "KOBERT_CACHE_TTL_SEC", 0)
+    old = chat._kobert_cache_key("old")
+    chat._kobert_cache_put({old: b"\x00\x00\x80?"})
+    chat.KOBERT_CACHE.execute("UPDATE kobert_cache SET created_at = 0")
+    new = chat._kobert_cache_key("new")
+    chat._kobert_cache_put({new: b"\x00\x00\x00@"})
+    assert chat._kobert_cache_get([old, new]) == {old: b"\x00\x00\x80?", new: b"\x00\x00\x00@"}
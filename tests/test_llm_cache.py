@@ -0,0 +1,88 @@
+import json
+
+import api.chat as chat
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self._data = data
+        self.content = json.dumps(data).encode("utf-8")
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+def test_generate_with_ollama_reuses_cached_response(monkeypatch):
+    calls = []
+
+    def fake_post(url, json=None, timeout=None):
+        calls.append(json["prompt"])
+        return FakeResponse({"response": "평안을 빕니다."})
+
+    monkeypatch.setattr(chat, "LLM_CACHE", chat.OrderedDict())
+    monkeypatch.setattr(chat.HTTP_SESSION, "post", fake_post)
+    assert chat.generate_with_ollama("prompt") == "평안을 빕니다."
+    assert chat.generate_with_ollama("prompt") == "평안을 빕니다."
+    assert chat.generate_with_ollama("other prompt") == "평안을 빕니다."
+    assert calls == ["prompt", "other prompt"]
+
+
+def test_generate_with_ollama_does_not_cache_empty_or_expired(monkeypatch):
+    calls = []
+    responses = [{"response": ""}, {"response": "응답"}, {"response": "새 응답"}]
+
+    def fake_post(url, json=None, timeout=None):
+        calls.append(json["prompt"])
+        return FakeResponse(responses[len(calls) - 1])
+
+    monkeypatch.setattr(chat, "LLM_CACHE", chat.OrderedDict())
+    monkeypatch.setattr(chat.HTTP_SESSION, "post", fake_post)
+    assert chat.generate_with_ollama("prompt") is None
+    assert chat.generate_with_ollama("prompt") == "응답"
+    monkeypatch.setattr(chat, "LLM_CACHE_TTL_SEC", -1)
+    chat.LLM_CACHE.clear()
+    chat._llm_cache_put(chat._llm_cache_key("ollama", chat.OLLAMA_MODEL, "prompt"), "응답")
+    assert chat.generate_with_ollama("prompt") == "새 응답"
+    assert len(calls) == 3
+
+
+def test_generate_with_ollama_treats_invalid_json_as_error(monkeypatch):
+    response = FakeResponse({})
+    response.content = b"<html>bad gateway</html>"
+    monkeypatch.setattr(chat, "LLM_CACHE", chat.OrderedDict())
+    monkeypatch.setattr(chat.HTTP_SESSION, "post", lambda *_args, **_kwargs: response)
+    assert chat.generate_with_ollama("prompt") is None
+
+
+def test_openai_cache_is_scoped_to_the_api_key(monkeypatch):
+    calls = []
+
+    def fake_post(url, json=None, headers=None, timeout=None):
+        calls.append(headers["Authorization"])
+        return FakeResponse({"choices": [{"message": {"content": f"응답 {len(calls)}"}}]})
+
+    monkeypatch.setattr(chat, "LLM_CACHE", chat.OrderedDict())
+    monkeypatch.setattr(chat.HTTP_SESSION, "post", fake_post)
+    assert chat.generate_with_openai("prompt", "sk-user-a") == "응답 1"
+    assert chat.generate_with_openai("prompt", "sk-user-a") == "응답 1"
+    assert chat.generate_with_openai("prompt", "sk-user-b") == "응답 2"
+    assert calls == ["Bearer sk-user-a", "Bearer sk-user-b"]
+
+
+def test_assistant_replies_bypass_the_cache(monkeypatch):
+    calls = []
+
+    def fake_post(url, json=None, timeout=None):
+        calls.append(json["prompt"])
+        return FakeResponse({"response": "평안을 빕니다."})
+
+    monkeypatch.setattr(chat, "LLM_CACHE", chat.OrderedDict())
+    monkeypatch.setattr(chat.HTTP_SESSION, "post", fake_post)
+    gating = {"need_verse": False, "topics": [], "user_goal": ""}
+    for _ in range(2):
+        assert chat.build_assistant_message("힘들어요", gating, "", []) == ("평안을 빕니다.", True)
+    assert len(calls) == 2
+    assert not chat.LLM_CACHE
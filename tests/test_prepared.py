@@ -0,0 +1,32 @@
+from api.prepared import execute_prepared
+
+
+class FakeConn:
+    pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.connection = conn
+        self.statements = []
+
+    def execute(self, query, params=None):
+        self.statements.append((query, params))
+
+
+def test_statement_is_prepared_once_per_connection():
+    conn = FakeConn()
+    cur = FakeCursor(conn)
+    sql = "SELECT text FROM bible_verse WHERE version_id = %s AND verse = %s"
+    numbered = "SELECT text FROM bible_verse WHERE version_id = $1 AND verse = $2"
+    execute_prepared(cur, "verse_text", sql, ("krv", 1))
+    execute_prepared(cur, "verse_text", sql, ("krv", 2))
+    assert cur.statements == [
+        (f"PREPARE verse_text AS {numbered}", None),
+        ("EXECUTE verse_text (%s, %s)", ("krv", 1)),
+        ("EXECUTE verse_text (%s, %s)", ("krv", 2)),
+    ]
+
+    other = FakeCursor(FakeConn())
+    execute_prepared(other, "verse_text", sql, ("krv", 3))
+    assert other.statements[0] == (f"PREPARE verse_text AS {numbered}", None)
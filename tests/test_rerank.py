@@ -0,0 +1,46 @@
+import api.chat as chat
+
+
+def test_rerank_skipped_for_literal_match(monkeypatch):
+    def fail(*_args, **_kwargs):
+        raise AssertionError("rerank should be skipped")
+
+    monkeypatch.setattr(chat, "_rerank_with_kobert", fail)
+    candidates = [
+        {"book_id": 1, "chapter": 1, "verse": 2, "keyword_hits": 1, "rank": 0.2, "trgm_sim": 0.1},
+        {"book_id": 1, "chapter": 1, "verse": 1, "keyword_hits": 3, "rank": 0.1, "trgm_sim": 0.2},
+    ]
+    assert chat._rerank_candidates("태초에", candidates) is candidates
+
+
+def test_rerank_runs_for_weak_lexical_match(monkeypatch):
+    calls = []
+    monkeypatch.setattr(chat, "_rerank_with_kobert", lambda _ctx, items: calls.append(items) or None)
+    candidates = [{"book_id": 1, "chapter": 1, "verse": 1, "keyword_hits": 1, "rank": 0.1, "trgm_sim": 0.2}]
+    assert chat._rerank_candidates("태초에", candidates) is candidates
+    assert calls == [candidates]
+
+
+def test_rerank_scores_are_cached_per_context_and_candidates(monkeypatch):
+    calls = []
+
+    def fake_kobert(_ctx, items):
+        calls.append(len(items))
+        for score, item in enumerate(items):
+            item["rerank_score"] = float(score)
+        return sorted(items, key=lambda x: -x["rerank_score"])
+
+    monkeypatch.setattr(chat, "_rerank_with_kobert", fake_kobert)
+    monkeypatch.setattr(chat, "RERANK_CACHE", chat.OrderedDict())
+
+    def candidates():
+        return [{"book_id": 1, "chapter": 1, "verse": v, "keyword_hits": 0, "text": "t"} for v in (1, 2, 3)]
+
+    first = chat._rerank_candidates("불안해요", candidates())
+    second = chat._rerank_candidates("불안해요", candidates())
+    assert calls == [3]
+    assert [c["verse"] for c in second] == [c["verse"] for c in first] == [3, 2, 1]
+    assert second[0]["rerank_score"] == 2.0
+
+    chat._rerank_candidates("다른 상황", candidates())
+    assert calls == [3, 3]
@@ -0,0 +1,62 @@
+from api.search import search_verses_first_hit
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.sql = None
+        self.params = None
+
+    def execute(self, sql, params):
+        self.sql = sql
+        self.params = params
+
+    def fetchall(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class FakeConn:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, cursor_factory=None):
+        return self._cursor
+
+
+def _row(branch, verse):
+    return {
+        "branch": branch,
+        "book_id": 19,
+        "book_name": "시편",
+        "chapter": 23,
+        "verse": verse,
+        "text": "text",
+        "text_norm": "text",
+        "rank": 0.1,
+        "trgm_sim": 0.2,
+    }
+
+
+def test_first_hit_builds_one_guarded_query():
+    cursor = FakeCursor([_row(1, 1), _row(1, 2)])
+    branch, items = search_verses_first_hit(FakeConn(cursor), "krv", ["불안 걱정", "근심", "잠이 안 와요"], 6)
+
+    assert branch == 1
+    assert [item["verse"] for item in items] == [1, 2]
+    assert items[0]["text_norm"] == "text"
+    assert "v.normalized AS text_norm" in cursor.sql
+    assert cursor.sql.count("%s") == len(cursor.params)
+    assert "NOT EXISTS (SELECT 1 FROM b0)" in cursor.sql
+    assert "NOT EXISTS (SELECT 1 FROM b1)" in cursor.sql
+
+
+def test_first_hit_skips_empty_queries():
+    cursor = FakeCursor([])
+    assert search_verses_first_hit(FakeConn(cursor), "krv", ["", "  "], 6) == (-1, [])
+    assert cursor.sql is None
@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from api.semantic_cache import SemanticCache
+
+
+def test_semantic_cache_hits_similar_vector_in_same_namespace():
+    cache = SemanticCache(capacity=4, ttl_sec=60, threshold=0.9)
+    cache.put(("krv", 2), [1.0, 0.0, 0.0], "anxiety")
+    assert cache.get(("krv", 2), [0.99, 0.05, 0.0]) == "anxiety"
+    assert cache.get(("krv", 2), [0.0, 1.0, 0.0]) is None
+    assert cache.get(("eng-web", 2), [1.0, 0.0, 0.0]) is None
+
+
+def test_semantic_cache_evicts_least_recently_used():
+    cache = SemanticCache(capacity=2, ttl_sec=60, threshold=0.9)
+    cache.put("ns", [1.0, 0.0], "a")
+    cache.put("ns", [0.0, 1.0], "b")
+    assert cache.get("ns", [1.0, 0.0]) == "a"
+    cache.put("ns", [-1.0, 0.0], "c")
+    assert cache.get("ns", [0.0, 1.0]) is None
+    assert cache.get("ns", [1.0, 0.0]) == "a"
+    assert cache.get("ns", [-1.0, 0.0]) == "c"
+
+
+def test_semantic_cache_expires_entries():
+    cache = SemanticCache(capacity=2, ttl_sec=-1, threshold=0.9)
+    cache.put("ns", [1.0, 0.0], "a")
+    assert cache.get("ns", [1.0, 0.0]) is None
+
+
+def test_semantic_cache_int8_matches_float32():
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((32, 64)).astype(np.float32)
+    exact = SemanticCache(capacity=32, ttl_sec=60, threshold=0.9)
+    quantized = SemanticCache(capacity=32, ttl_sec=60, threshold=0.9, quantize=True)
+    for idx, vec in enumerate(vectors):
+        exact.put("ns", vec.tolist(), idx)
+        quantized.put("ns", vec.tolist(), idx)
+    assert quantized._matrix.dtype == np.int8
+    for idx, vec in enumerate(vectors):
+        query = (vec + 0.05 * rng.standard_normal(64)).tolist()
+        assert quantized.get("ns", query) == exact.get("ns", query) == idx
+    assert quantized.get("ns", rng.standard_normal(64).tolist()) is None
+
+
+def test_confident_fts_does_not_wait_on_embedding_without_cache(monkeypatch):
+    from concurrent.futures import Future
+
+    import api.chat as chat
+
+    pending = Future()
+    verse = {
+        "book_id": 40,
+        "book_name": "마태복음",
+        "chapter": 11,
+        "verse": 28,
+        "text": "수고하고 무거운 짐 진 자들아 다 내게로 오라 내가 너희를 쉬게 하리라",
+        "rank": 0.9,
+    }
+    monkeypatch.setattr(chat, "VECTOR_ENABLED", True)
+    monkeypatch.setattr(chat, "RERANK_MODE", "off")
+    monkeypatch.setattr(chat, "citation_cache", SemanticCache(capacity=0, ttl_sec=60, threshold=0.9))
+    monkeypatch.setattr(chat, "_submit_embed", lambda _text: pending)
+    monkeypatch.setattr(chat, "extract_keywords_from_texts", lambda *_args, **_kwargs: ["수고", "무거운"])
+    monkeypatch.setattr(chat, "_expand_synonyms", lambda _conn, _terms: [])
+    monkeypatch.setattr(chat, "_get_kiwi", lambda: None)
+    monkeypatch.setattr(chat, "search_verses_first_hit", lambda *_args: (0, [dict(verse)]))
+
+    citations, meta = chat.retrieve_citations(None, "krv", "수고하고 무거운 짐")
+
+    assert meta["vector_skipped"] == "fts_confident"
+    assert [c["verse_start"] for c in citations] == [28]
+    assert not pending.done()
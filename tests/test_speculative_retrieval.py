@@ -0,0 +1,152 @@
+from concurrent.futures import Future
+
+import api.main as main_mod
+from api.chat import store
+from api.models import ChatMessageRequest
+
+
+class FakeConn:
+    def cursor(self, cursor_factory=None):
+        raise AssertionError("no database access expected")
+
+    def commit(self):
+        return None
+
+    def rollback(self):
+        return None
+
+
+CITATION = {
+    "version_id": "krv",
+    "book_id": 19,
+    "book_name": "시편",
+    "chapter": 23,
+    "verse_start": 1,
+    "verse_end": 1,
+    "text": "여호와는 나의 목자시니 내게 부족함이 없으리로다",
+}
+
+
+def _prepare(monkeypatch, need_verse: bool):
+    record = store.create(device_id="test", locale="ko-KR", version_id="krv", store_messages=False)
+    monkeypatch.setattr(
+        main_mod,
+        "get_conversation_meta",
+        lambda _cid: {
+            "mode": "authenticated",
+            "store_messages": False,
+            "expires_at": None,
+            "turn_limit": 10,
+            "turn_count": 0,
+        },
+    )
+    monkeypatch.setattr(
+        main_mod,
+        "enforce_turn_and_increment",
+        lambda _cid, *_args, **_kwargs: {"status": "ok", "turn_count": 1, "turn_limit": 10, "expires_at": None},
+    )
+
+    def fake_gate(*_args, on_llm_gate=None, **_kwargs):
+        on_llm_gate()
+        return {
+            "need_verse": need_verse,
+            "topics": [],
+            "user_goal": "",
+            "risk_flags": [],
+            "llm_ok": True,
+            "source": "llm",
+            "trigger_reason": [],
+            "exclude_reason": [],
+        }
+
+    monkeypatch.setattr(main_mod, "gate_need_verse", fake_gate)
+    monkeypatch.setattr(main_mod, "build_assistant_message", lambda *_args, **_kwargs: ("테스트 응답", True))
+    return record["conversation_id"]
+
+
+def test_llm_gate_uses_speculative_retrieval(monkeypatch):
+    conversation_id = _prepare(monkeypatch, need_verse=True)
+    calls = []
+
+    def fake_detached(version_id, user_message, **_kwargs):
+        calls.append((version_id, user_message))
+        return [dict(CITATION)], {"failure_reason": None}
+
+    def fail_retrieve(*_args, **_kwargs):
+        raise AssertionError("retrieval should come from the speculative task")
+
+    monkeypatch.setattr(main_mod, "_retrieve_citations_detached", fake_detached)
+    monkeypatch.setattr(main_mod, "retrieve_citations", fail_retrieve)
+    payload = ChatMessageRequest(user_message="요즘 마음이 무거워요", client_context=None)
+    response = main_mod.post_message(conversation_id, payload, conn=FakeConn())
+
+    assert len(calls) == 1
+    assert response["citations"][0]["book_id"] == 19
+    store.delete(conversation_id)
+
+
+def test_speculative_retrieval_is_discarded_when_gate_declines(monkeypatch):
+    conversation_id = _prepare(monkeypatch, need_verse=False)
+    futures = []
+
+    def fake_submit(fn, *args, **kwargs):
+        future = Future()
+        futures.append(future)
+        return future
+
+    monkeypatch.setattr(main_mod.RETRIEVAL_EXECUTOR, "submit", fake_submit)
+    payload = ChatMessageRequest(user_message="요즘 마음이 무거워요", client_context=None)
+    response = main_mod.post_message(conversation_id, payload, conn=FakeConn())
+
+    assert response["citations"] == []
+    assert futures[0].cancelled()
+    store.delete(conversation_id)
+
+
+def test_slow_speculative_retrieval_falls_back_inline(monkeypatch):
+    conversation_id = _prepare(monkeypatch, need_verse=True)
+    futures = []
+    inline = []
+
+    def fake_submit(fn, *args, **kwargs):
+        future = Future()
+        futures.append(future)
+        return future
+
+    def fake_retrieve(_conn, version_id, user_message, **_kwargs):
+        inline.append(user_message)
+        return [dict(CITATION)], {"failure_reason": None}
+
+    monkeypatch.setattr(main_mod, "SPECULATIVE_RETRIEVAL_TIMEOUT_SEC", 0.01)
+    monkeypatch.setattr(main_mod.RETRIEVAL_EXECUTOR, "submit", fake_submit)
+    monkeypatch.setattr(main_mod, "retrieve_citations", fake_retrieve)
+    monkeypatch.setattr(main_mod, "_verify_citations", lambda _conn, citations: citations)
+    payload = ChatMessageRequest(user_message="요즘 마음이 무거워요", client_context=None)
+    response = main_mod.post_message(conversation_id, payload, conn=FakeConn())
+
+    assert inline == ["요즘 마음이 무거워요"]
+    assert futures[0].cancelled()
+    assert response["citations"][0]["book_id"] == 19
+    store.delete(conversation_id)
+
+
+def test_speculation_is_skipped_without_a_free_slot(monkeypatch):
+    conversation_id = _prepare(monkeypatch, need_verse=False)
+    submitted = []
+    monkeypatch.setattr(main_mod.RETRIEVAL_EXECUTOR, "submit", lambda *args, **kwargs: submitted.append(args))
+    monkeypatch.setattr(main_mod, "RETRIEVAL_SLOTS", main_mod.threading.BoundedSemaphore(1))
+    main_mod.RETRIEVAL_SLOTS.acquire()
+    payload = ChatMessageRequest(user_message="요즘 마음이 무거워요", client_context=None)
+    main_mod.post_message(conversation_id, payload, conn=FakeConn())
+
+    assert submitted == []
+    store.delete(conversation_id)
+
+
+def test_detached_retrieval_skips_when_pool_is_exhausted(monkeypatch):
+    class ExhaustedPool:
+        def getconn(self):
+            raise main_mod.PoolError("connection pool exhausted")
+
+    monkeypatch.setattr(main_mod, "_get_pg_pool", lambda: ExhaustedPool())
+    assert main_mod._retrieve_citations_detached("krv", "요즘 마음이 무거워요") is None
@@ -0,0 +1,19 @@
+import api.chat as chat
+
+
+def test_summarize_messages_prompts_with_recent_tail(monkeypatch):
+    prompts = []
+
+    def fake_llm(prompt, **_kwargs):
+        prompts.append(prompt)
+        return "요약"
+
+    monkeypatch.setattr(chat, "generate_with_llm", fake_llm)
+    messages = [{"role": "user", "content": f"메시지{idx:03d}"} for idx in range(100)]
+    assert chat.summarize_messages(messages, "이전 요약") == "요약"
+
+    prompt = prompts[0]
+    assert "이전 요약" in prompt
+    assert "메시지099" in prompt
+    assert f"메시지{100 - chat.SUMMARY_TRIGGER_TURNS:03d}" in prompt
+    assert f"메시지{99 - chat.SUMMARY_TRIGGER_TURNS:03d}" not in prompt
@@ -0,0 +1,39 @@
+import api.chat as chat
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = []
+
+    def execute(self, query, params=None):
+        self.params.append(params)
+
+    def fetchall(self):
+        terms = self.params[-1][0]
+        return [row for row in self.rows if row[0] in terms]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class FakeConn:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, cursor_factory=None):
+        return self._cursor
+
+
+def test_fetch_synonyms_queries_only_uncached_terms(monkeypatch):
+    monkeypatch.setattr(chat, "SYNONYM_CACHE", chat.OrderedDict())
+    cursor = FakeCursor([("불안", "근심"), ("불안", "염려")])
+    conn = FakeConn(cursor)
+
+    assert chat._fetch_synonyms_from_db(conn, ["불안", "평안"]) == {"불안": ["근심", "염려"]}
+    assert chat._fetch_synonyms_from_db(conn, ["불안", "평안"]) == {"불안": ["근심", "염려"]}
+    assert chat._fetch_synonyms_from_db(conn, ["불안", "분노"]) == {"불안": ["근심", "염려"]}
+    assert cursor.params == [(["불안", "평안"],), (["분노"],)]